@@ -0,0 +1,160 @@
+"""Startup-time benchmark for cli.py, to catch import-time regressions.
+
+Each case starts a fresh interpreter several times and reports the median wall time, along with any
+heavy backend modules it imported. There are three kinds of case:
+
+- `cli.py <subcommand> --help`, which must not load any backend;
+- importing each subcommand's backend module the way its handler does, with the heavy modules
+  that module defers (for example pygame and gTTS for gemini_gtts) forbidden at import time;
+- running real handlers that finish offline (`research-agent --once` with no categories, and
+  `promote-audio` on an empty promotions CSV).
+
+A case fails when its median exceeds `--budget-ms`, when it imports a forbidden module, or when it
+exits with an error:
+
+    python benchmarks/bench_startup.py --repeats 10 --budget-ms 150 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CLI = str(REPO_ROOT / 'cli.py')
+
+HEAVY_MODULES = ('requests', 'yaml', 'pygame', 'gtts', 'sqlite3', 'http.server')
+# Deferred by every backend until it actually needs them
+AUDIO_AND_CONFIG = ('yaml', 'pygame', 'gtts')
+
+
+def handler_import(module: str, subdirectory: str = '') -> List[str]:
+    """Interpreter arguments that import `module` the way cli.py's handler for it does."""
+    path = f"sys.path.insert(0, {str(REPO_ROOT / subdirectory)!r}); " if subdirectory else ""
+    return ['-c', f"import sys; {path}import {module}"]
+
+
+def build_cases(workdir: Path) -> List[Tuple[str, List[str], Tuple[str, ...]]]:
+    """(name, interpreter arguments, modules the case must not import) for every case."""
+    config = workdir / 'research_config.yaml'
+    # JSON is valid YAML, so the config can be written without importing yaml here
+    config.write_text(json.dumps({
+        'research_categories': [],
+        'update_frequency': {},
+        'output_directory': str(workdir / 'research_reports'),
+        'cache': {'enabled': False},
+        'research_store': {'path': str(workdir / 'research.sqlite')}
+    }))
+    promotions = workdir / 'promotions.csv'
+    promotions.write_text("product_name,original_description,generated_promotion,error\n")
+
+    cases = [(f"cli {' '.join(args)}", [CLI] + args, forbidden) for args, forbidden in [
+        (['--help'], HEAVY_MODULES),
+        (['chat-espeak', '--help'], HEAVY_MODULES),
+        (['chat-gtts', '--help'], HEAVY_MODULES),
+        (['research-species', '--help'], HEAVY_MODULES),
+        (['research-agent', '--help'], HEAVY_MODULES),
+        (['promote', '--help'], AUDIO_AND_CONFIG),
+        (['promote-audio', '--help'], HEAVY_MODULES),
+    ]]
+    cases += [(f"import {module}", handler_import(module, subdirectory), forbidden)
+              for module, subdirectory, forbidden in [
+                  ('gemini_espeak', '', AUDIO_AND_CONFIG),
+                  ('gemini_gtts', '', AUDIO_AND_CONFIG),
+                  ('gemini_research_agent', '', AUDIO_AND_CONFIG),
+                  ('gemini_research_and_report_system', '', AUDIO_AND_CONFIG),
+                  ('promotional_text_generator', 'product_promotions', AUDIO_AND_CONFIG),
+                  ('render_promotion_audio', 'product_promotions', HEAVY_MODULES),
+              ]]
+    cases += [
+        ("run research-agent --once", [CLI, 'research-agent', '--config', str(config), '--once'], ('pygame', 'gtts')),
+        ("run promote-audio", [CLI, 'promote-audio', str(promotions), '--output-dir', str(workdir / 'audio')],
+         HEAVY_MODULES),
+    ]
+    return cases
+
+
+def environment() -> Dict[str, str]:
+    # Cases run from a scratch directory (handlers may write logs there), so the repo goes on the path
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.getenv('PYTHONPATH')])))
+    env.setdefault('GEMINI_API_KEY', 'startup-benchmark')
+    return env
+
+
+def imported_modules(args: List[str], workdir: Path) -> Tuple[Dict[str, int], int]:
+    """Runs the case once under -X importtime; returns cumulative microseconds per module and the exit code."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, capture_output=True, text=True,
+                            cwd=workdir, env=environment())
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules, result.returncode
+
+
+def wall_times(command: List[str], repeats: int, workdir: Path) -> List[float]:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       cwd=workdir, env=environment())
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cli.py startup time per subcommand and backend.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if a case's median exceeds this")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as scratch:
+        workdir = Path(scratch)
+        baseline = statistics.median(wall_times([sys.executable, '-c', 'pass'], args.repeats, workdir))
+        print(f"bare interpreter: {baseline * 1000:.1f} ms")
+
+        results, failures = [], []
+        for name, case_args, forbidden in build_cases(workdir):
+            median = statistics.median(wall_times([sys.executable] + case_args, args.repeats, workdir))
+            modules, returncode = imported_modules(case_args, workdir)
+            heavy = sorted(module for module in forbidden if any(name == module or name.startswith(f"{module}.")
+                                                                 for name in modules))
+            slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+            results.append({
+                'case': name,
+                'args': case_args,
+                'exit_code': returncode,
+                'median_ms': round(median * 1000, 1),
+                'over_interpreter_ms': round((median - baseline) * 1000, 1),
+                'unexpected_imports': heavy,
+                'slowest_imports_us': dict(slowest)
+            })
+            print(f"{name:<48} {median * 1000:7.1f} ms" + (f"  imports {', '.join(heavy)}" if heavy else "")
+                  + (f"  exit {returncode}" if returncode else ""))
+            if heavy:
+                failures.append(f"{name}: imports {', '.join(heavy)}")
+            if returncode:
+                failures.append(f"{name}: exited with {returncode}")
+            if args.budget_ms is not None and median * 1000 > args.budget_ms:
+                failures.append(f"{name}: {median * 1000:.1f} ms exceeds the {args.budget_ms} ms budget")
+
+    if args.output:
+        with open(os.path.abspath(args.output), 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'interpreter_ms': round(baseline * 1000, 1),
+                       'results': results}, file, indent=2)
+    if failures:
+        print("\nStartup regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Local stand-in for the Gemini API, for benchmarking without spending quota.
+
+Implements generateContent and streamGenerateContent (SSE) with configurable latency distributions,
+429/500 injection and response sizes, plus cachedContents registration for context-cache tests.
+All randomness comes from one seeded generator, so a run with the same settings and request order
+is reproducible.
+
+    python benchmarks/mock_gemini_server.py --port 8765 --latency lognormal:3.9,0.4 --error-429 0.02
+    GEMINI_API_BASE=http://127.0.0.1:8765 GEMINI_API_KEY=test python gemini_espeak.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+WORDS = ("logic system signal market product value comfort design analysis trend growth power "
+         "quality feature benefit customer network module vector output precise").split()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Parses a latency spec in milliseconds: `fixed:MS`, `uniform:LOW,HIGH` or `lognormal:MU,SIGMA`."""
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(values[0], values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class MockGeminiConfig:
+    def __init__(self, latency: str = 'fixed:50', error_429: float = 0.0, error_500: float = 0.0,
+                 response_words: int = 80, stream_chunks: int = 8, retry_after: Optional[float] = 1.0,
+                 seed: int = 0, min_cache_tokens: int = 0):
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.response_words = response_words
+        self.stream_chunks = stream_chunks
+        self.retry_after = retry_after
+        self.seed = seed
+        self.min_cache_tokens = min_cache_tokens
+        self.cached_contents: Dict[str, Dict] = {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {'requests': 0, 'stream_requests': 0, '429': 0, '500': 0,
+                                         'cached_contents': 0}
+
+    def draw(self):
+        """Returns (latency seconds, injected status or None) from the shared seeded generator."""
+        with self.lock:
+            latency = self.latency(self.rng)
+            roll = self.rng.random()
+        if roll < self.error_429:
+            return latency, 429
+        if roll < self.error_429 + self.error_500:
+            return latency, 500
+        return latency, None
+
+    def text(self, words: Optional[int] = None) -> str:
+        with self.lock:
+            chosen = [self.rng.choice(WORDS) for _ in range(words or self.response_words)]
+        sentences = [" ".join(chosen[i:i + 12]).capitalize() + "." for i in range(0, len(chosen), 12)]
+        return " ".join(sentences)
+
+    def count(self, key: str):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+
+def usage_metadata(request: Dict, response_text: str, cached: Optional[Dict] = None) -> Dict:
+    prompt_chars = len(json.dumps(request.get('contents', []))) + len(json.dumps(request.get('systemInstruction', {})))
+    cached_tokens = cached['tokens'] if cached else 0
+    prompt_tokens = max(1, prompt_chars // 4) + cached_tokens
+    candidates_tokens = max(1, len(response_text) // 4)
+    usage = {
+        'promptTokenCount': prompt_tokens,
+        'candidatesTokenCount': candidates_tokens,
+        'totalTokenCount': prompt_tokens + candidates_tokens
+    }
+    if cached_tokens:
+        usage['cachedContentTokenCount'] = cached_tokens
+    return usage
+
+
+def packed_response_text(config: MockGeminiConfig, request: Dict) -> str:
+    """Answers a packed promotion request with one script per product id found in the prompt."""
+    prompt = "".join(part.get('text', '') for content in request.get('contents', []) for part in content['parts'])
+    match = re.search(r'\[\{.*\}\]', prompt, re.S)
+    products = json.loads(match.group(0)) if match else []
+    return json.dumps({'promotions': [{'id': product['id'], 'script': config.text()} for product in products]})
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY delayed ACKs add ~40 ms per request
+    disable_nagle_algorithm = True
+    config: MockGeminiConfig
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_status(self, status: int):
+        self.config.count(str(status))
+        headers = {'Retry-After': str(self.config.retry_after)} if status == 429 and self.config.retry_after else {}
+        message = 'Resource has been exhausted' if status == 429 else 'Internal error'
+        self._send_json(status, {'error': {'code': status, 'message': message}}, headers)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.split('?')[0].endswith('/cachedContents'):
+            return self._create_cached_content(request)
+        cached = self.config.cached_contents.get(request.get('cachedContent'))
+        if request.get('cachedContent') and cached is None:
+            return self._send_json(404, {'error': {'code': 404, 'message': 'CachedContent not found'}})
+        latency, status = self.config.draw()
+
+        if ':streamGenerateContent' in self.path:
+            self.config.count('stream_requests')
+            if status:
+                time.sleep(latency)
+                return self._send_error_status(status)
+            return self._stream(request, latency, cached)
+        if ':generateContent' in self.path:
+            self.config.count('requests')
+            time.sleep(latency)
+            if status:
+                return self._send_error_status(status)
+            if request.get('generationConfig', {}).get('responseMimeType') == 'application/json':
+                text = packed_response_text(self.config, request)
+            else:
+                text = self.config.text()
+            return self._send_json(200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': usage_metadata(request, text, cached)
+            })
+        self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+
+    def _create_cached_content(self, request: Dict):
+        tokens = max(1, len(json.dumps(request.get('systemInstruction', {}))) // 4)
+        if tokens < self.config.min_cache_tokens:
+            message = f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.config.min_cache_tokens}"
+            return self._send_json(400, {'error': {'code': 400, 'message': message}})
+        self.config.count('cached_contents')
+        with self.config.lock:
+            name = f"cachedContents/mock{len(self.config.cached_contents) + 1}"
+            self.config.cached_contents[name] = {'tokens': tokens}
+        self._send_json(200, {'name': name, 'model': request.get('model'), 'usageMetadata': {'totalTokenCount': tokens}})
+
+    def _stream(self, request: Dict, latency: float, cached: Optional[Dict] = None):
+        """Sends the response as SSE events, spreading `latency` over the chunks after the first."""
+        words = self.config.text().split(' ')
+        chunks = max(1, self.config.stream_chunks)
+        size = max(1, -(-len(words) // chunks))
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(latency / 2)
+        for index, piece in enumerate(pieces):
+            event = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}}]}
+            if index == len(pieces) - 1:
+                event['usageMetadata'] = usage_metadata(request, " ".join(pieces), cached)
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8')
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+            if index < len(pieces) - 1:
+                time.sleep(latency / 2 / max(1, len(pieces) - 1))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_server(config: MockGeminiConfig, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Starts the mock server on a background thread; port 0 picks a free port (see server.server_port)."""
+    handler = type('ConfiguredMockGeminiHandler', (MockGeminiHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="fixed:50", help="fixed:MS, uniform:LOW,HIGH or lognormal:MU,SIGMA")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--response-words", type=int, default=80, help="words per generated response")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="SSE events per streamed response")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-cache-tokens", type=int, default=0,
+                        help="reject cachedContents smaller than this, like the real API's minimum")
+
+
+def config_from_args(args) -> MockGeminiConfig:
+    return MockGeminiConfig(
+        latency=args.latency,
+        error_429=args.error_429,
+        error_500=args.error_500,
+        response_words=args.response_words,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed,
+        min_cache_tokens=args.min_cache_tokens
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Gemini API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(config_from_args(args), args.host, args.port)
+    print(f"Mock Gemini API listening on http://{args.host}:{server.server_port}")
+    print(f"Use: GEMINI_API_BASE=http://{args.host}:{server.server_port} GEMINI_API_KEY=test")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Offline benchmark suite for the Gemini tools, run against the local mock server.
+
+Measures PromotionGenerator throughput on synthetic catalogs, ResearchAgent.generate_report wall time
+per category, and time-to-first-audio for the two voice scripts with speech synthesis stubbed out.
+Results are written as JSON (with the git commit and every setting) so runs can be compared:
+
+    python benchmarks/run_benchmarks.py --rows 1000,10000 --output bench-main.json
+    python benchmarks/run_benchmarks.py --rows 1000,10000 --output bench-branch.json --compare bench-main.json
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import importlib
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'product_promotions'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_gemini_server import add_server_arguments, config_from_args, start_server
+
+PRODUCT_WORDS = "ergonomic portable premium wireless compact durable smart eco-friendly adjustable quiet".split()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_catalog(path: Path, rows: int, seed: int):
+    """Writes a synthetic product catalog with the same columns as sample_products.csv."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'description', 'price'])
+        for index in range(rows):
+            words = " ".join(rng.choice(PRODUCT_WORDS) for _ in range(20))
+            writer.writerow([f"Product {index}", f"{words.capitalize()}.", f"{rng.uniform(5, 500):.2f}"])
+
+
+def bench_promotions(rows_list: List[int], concurrency: int, pack_size: int, seed: int, workdir: Path) -> List[Dict]:
+    from promotional_text_generator import PromotionGenerator
+
+    results = []
+    for rows in rows_list:
+        catalog = workdir / f"catalog_{rows}.csv"
+        output = workdir / f"promotions_{rows}.csv"
+        write_catalog(catalog, rows, seed)
+        generator = PromotionGenerator(pool_size=max(10, concurrency))
+        start = time.perf_counter()
+        summary = generator.process_csv_to_file(str(catalog), str(output), concurrency, resume=False,
+                                                pack_size=pack_size)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'rows': rows,
+            'concurrency': concurrency,
+            'pack_size': pack_size,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(summary['rows'] / elapsed, 2),
+            'failed': summary['failed'],
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        })
+        print(f"promotions rows={rows}: {results[-1]['rows_per_second']} rows/s")
+    return results
+
+
+def bench_research(repeats: int, workdir: Path) -> List[Dict]:
+    import yaml
+    from gemini_research_and_report_system import ResearchAgent
+
+    config_path = workdir / 'research_config.yaml'
+    with open(config_path, 'w') as file:
+        yaml.safe_dump({
+            'api_key': os.environ['GEMINI_API_KEY'],
+            'research_categories': ['technology', 'market_trends', 'industry_developments'],
+            'update_frequency': {'technology': '12h', 'market_trends': '24h', 'industry_developments': '48h'},
+            'output_directory': str(workdir / 'research_reports'),
+            'cache': {'enabled': False}
+        }, file)
+
+    agent = ResearchAgent(str(config_path))
+    results = []
+    for category in agent.config['research_categories']:
+        timings = []
+        for _ in range(repeats):
+            agent.conversation_history[category].clear()
+            start = time.perf_counter()
+            agent.generate_report(category)
+            timings.append(time.perf_counter() - start)
+        results.append({
+            'category': category,
+            'repeats': repeats,
+            'median_seconds': round(statistics.median(timings), 3),
+            'max_seconds': round(max(timings), 3)
+        })
+        print(f"research {category}: {results[-1]['median_seconds']} s median")
+    return results
+
+
+class StubSynthesizer:
+    sample_rate = 22050
+
+    def __init__(self, synth_ms: float):
+        self.synth_ms = synth_ms
+
+    def synthesize(self, text: str, write, cancelled):
+        time.sleep(self.synth_ms / 1000)
+        write(b'\0\0' * 256)
+
+    def cancel(self):
+        pass
+
+
+class StubSink:
+    """Stands in for the aplay process; records when the first PCM reaches it."""
+
+    class Input:
+        def __init__(self, first_audio: List[float]):
+            self.first_audio = first_audio
+
+        def write(self, pcm: bytes):
+            if not self.first_audio:
+                self.first_audio.append(time.perf_counter())
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    def __init__(self, first_audio: List[float]):
+        self.stdin = self.Input(first_audio)
+
+    def wait(self):
+        pass
+
+
+def espeak_first_audio(module, synth_ms: float) -> float:
+    """Runs one reply through gemini_espeak.main's path: split_sentences into an EspeakWorker."""
+    from conversation_memory import ConversationMemory
+    from espeak_worker import EspeakWorker
+    from speech_pipeline import split_sentences, tee_chunks
+
+    first_audio = []
+    worker = EspeakWorker(synthesizer=StubSynthesizer(synth_ms), sink=StubSink(first_audio))
+    start = time.perf_counter()
+    for sentence in split_sentences(tee_chunks(module.stream_gemini_response("Describe your design.",
+                                                                             ConversationMemory()), [])):
+        worker.speak(sentence)
+    worker.wait()
+    worker.close()
+    return first_audio[0] - start
+
+
+def gtts_first_audio(module, synth_ms: float) -> float:
+    """Runs one reply through gemini_gtts.main's path: a SpeechPipeline of synthesis and playback."""
+    from conversation_memory import ConversationMemory
+    from speech_pipeline import SpeechPipeline
+
+    first_audio = []
+    pipeline = SpeechPipeline(lambda sentence: (time.sleep(synth_ms / 1000), sentence)[1],
+                              lambda audio: first_audio.append(time.perf_counter()) if not first_audio else None)
+    start = time.perf_counter()
+    pipeline.speak_stream(module.stream_gemini_response("Describe your design.", ConversationMemory()))
+    return first_audio[0] - start
+
+
+def bench_time_to_first_audio(repeats: int, synth_ms: float) -> List[Dict]:
+    """Streams a reply through each voice script's own speech path with stubbed synthesis and playback."""
+    results = []
+    for module_name, first_audio in (('gemini_espeak', espeak_first_audio), ('gemini_gtts', gtts_first_audio)):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as e:
+            results.append({'script': module_name, 'skipped': f"import failed: {e}"})
+            print(f"time-to-first-audio {module_name}: skipped ({e})")
+            continue
+
+        timings = [first_audio(module, synth_ms) for _ in range(repeats)]
+        results.append({
+            'script': module_name,
+            'repeats': repeats,
+            'synth_ms': synth_ms,
+            'median_seconds': round(statistics.median(timings), 4),
+            'max_seconds': round(max(timings), 4)
+        })
+        print(f"time-to-first-audio {module_name}: {results[-1]['median_seconds']} s median")
+    return results
+
+
+def compare(current: Dict, baseline: Dict):
+    """Prints the relative change of each headline metric against a previous report."""
+    def index(report, section, key):
+        return {entry[key]: entry for entry in report.get('results', {}).get(section, []) if key in entry}
+
+    print(f"\nComparison against {baseline.get('git_commit') or 'baseline'}:")
+    for section, key, metric in (('promotions', 'rows', 'rows_per_second'),
+                                 ('research', 'category', 'median_seconds'),
+                                 ('time_to_first_audio', 'script', 'median_seconds')):
+        old, new = index(baseline, section, key), index(current, section, key)
+        for name in new:
+            if name in old and metric in old[name] and metric in new[name] and old[name][metric]:
+                change = (new[name][metric] - old[name][metric]) / old[name][metric] * 100
+                print(f"  {section}[{name}] {metric}: {old[name][metric]} -> {new[name][metric]} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Gemini tools against a local mock server.")
+    parser.add_argument("--rows", default="1000", help="comma-separated catalog sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pack-size", type=int, default=1)
+    parser.add_argument("--research-repeats", type=int, default=3)
+    parser.add_argument("--audio-repeats", type=int, default=5)
+    parser.add_argument("--synth-ms", type=float, default=30.0, help="stubbed synthesis time per sentence")
+    parser.add_argument("--only", choices=['promotions', 'research', 'audio'], action='append',
+                        help="run only the named benchmark (repeatable)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    server = start_server(config_from_args(args))
+    os.environ['GEMINI_API_BASE'] = f"http://127.0.0.1:{server.server_port}"
+    os.environ['GEMINI_API_KEY'] = 'benchmark'
+    os.environ['GEMINI_CACHE_BYPASS'] = '1'
+    selected = set(args.only or ['promotions', 'research', 'audio'])
+
+    report = {
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': {}
+    }
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        # ResearchAgent writes its log file to the working directory
+        os.chdir(workdir)
+        if 'promotions' in selected:
+            rows_list = [int(rows) for rows in args.rows.split(',')]
+            report['results']['promotions'] = bench_promotions(rows_list, args.concurrency, args.pack_size,
+                                                               args.seed, workdir)
+        if 'research' in selected:
+            report['results']['research'] = bench_research(args.research_repeats, workdir)
+        if 'audio' in selected:
+            report['results']['time_to_first_audio'] = bench_time_to_first_audio(args.audio_repeats, args.synth_ms)
+        os.chdir(original_cwd)
+    report['mock_server'] = dict(server.RequestHandlerClass.config.counters)
+    server.shutdown()
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {output}")
+    if baseline:
+        with open(baseline) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
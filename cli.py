@@ -0,0 +1,90 @@
+"""Single entry point for the Gemini tools.
+
+Only argparse is imported up front; each subcommand imports its backend (requests, pygame, gTTS,
+yaml, ...) when it runs, so `--help` and unrelated subcommands start quickly.
+
+    python cli.py chat-espeak
+    python cli.py chat-gtts
+    python cli.py research-species "Passer domesticus"
+    python cli.py research-agent --config research_config.yaml [--once]
+    python cli.py promote products.csv promotions.csv --concurrency 8
+    python cli.py promote-audio promotions.csv --processes 8
+"""
+import sys
+import argparse
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+
+def chat_espeak(args, extra):
+    from gemini_espeak import main
+    main()
+
+
+def chat_gtts(args, extra):
+    from gemini_gtts import main
+    main()
+
+
+def research_species(args, extra):
+    from gemini_research_agent import metrics, research_species
+    for species in args.species:
+        research_species(species)
+    print(metrics.summary_json())
+
+
+def research_agent(args, extra):
+    from gemini_research_and_report_system import ResearchAgent
+    agent = ResearchAgent(args.config)
+    if args.once:
+        return 0 if agent.run_once() else 1
+    agent.run()
+
+
+def promote(args, extra):
+    sys.path.insert(0, str(REPO_ROOT / 'product_promotions'))
+    from promotional_text_generator import main
+    main(extra)
+
+
+def promote_audio(args, extra):
+    sys.path.insert(0, str(REPO_ROOT / 'product_promotions'))
+    from render_promotion_audio import main
+    return main(extra)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Gemini voice assistants, research and promotions.")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    subparsers.add_parser("chat-espeak", help="voice chat spoken with espeak-ng").set_defaults(handler=chat_espeak)
+    subparsers.add_parser("chat-gtts", help="voice chat spoken with Google TTS").set_defaults(handler=chat_gtts)
+
+    species = subparsers.add_parser("research-species", help="write a research report per species")
+    species.add_argument("species", nargs="*", default=["Passer domesticus"])
+    species.set_defaults(handler=research_species)
+
+    agent = subparsers.add_parser("research-agent", help="run the scheduled category research agent")
+    agent.add_argument("--config", default="research_config.yaml")
+    agent.add_argument("--once", action="store_true", help="research every category once and exit")
+    agent.set_defaults(handler=research_agent)
+
+    # Options are forwarded untouched, so `promote --help` shows the generator's own flags
+    subparsers.add_parser("promote", add_help=False, help="generate promotional scripts for a product CSV "
+                          "(see `promote --help`)").set_defaults(handler=promote)
+    subparsers.add_parser("promote-audio", add_help=False, help="render a promotions CSV to WAV clips with "
+                          "espeak-ng (see `promote-audio --help`)").set_defaults(handler=promote_audio)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command not in ("promote", "promote-audio"):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args, extra)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Summarizer = Callable[[str, str], str]
+
+SUMMARY_PROMPT = """Condense the following conversation into a brief summary of at most {max_words} words.
+Keep facts, names, numbers and open questions; drop pleasantries.
+
+Existing summary:
+{summary}
+
+New conversation turns:
+{turns}"""
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def content_entry(role: str, text: str) -> Dict[str, Any]:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def gemini_summarizer(client, max_words: int = 150) -> Summarizer:
+    """Builds a summarizer that asks the model to fold evicted turns into the running summary."""
+    def summarize(summary: str, turns: str) -> str:
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)", turns=turns)
+        return client.generate_text(prompt, default=summary)
+    return summarize
+
+
+class ConversationMemory:
+    """Rolling window of conversation turns, sent as native multi-turn `contents` within a token budget.
+
+    Turns are stored as ready-made `contents` entries with a cached token count, so each request only
+    appends the new user turn instead of re-rendering the whole history. When the budget (or `max_turns`)
+    is exceeded the oldest turns are evicted down to `low_water` of the budget, so a summarizer (if given)
+    runs once per batch of evicted turns rather than on every turn; the running summary is sent ahead
+    of the remaining turns.
+    """
+
+    def __init__(self, token_budget: int = 4000, max_turns: Optional[int] = None,
+                 summarizer: Optional[Summarizer] = None, low_water: float = 0.75):
+        self.token_budget = token_budget
+        self.low_water = low_water
+        self.max_turns = max_turns
+        self.summarizer = summarizer
+        self.turns: "deque[Tuple[Dict[str, Any], Dict[str, Any], int]]" = deque()
+        self.tokens = 0
+        self.summary = ""
+        self.summary_entries: List[Dict[str, Any]] = []
+        self.summary_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def add_turn(self, query: str, response: str):
+        tokens = estimate_tokens(query) + estimate_tokens(response)
+        self.turns.append((content_entry("user", query), content_entry("model", response), tokens))
+        self.tokens += tokens
+        self._enforce_budget()
+
+    def _over_budget(self, budget: float) -> bool:
+        if self.max_turns is not None and len(self.turns) > self.max_turns:
+            return True
+        return self.tokens + self.summary_tokens > budget and len(self.turns) > 1
+
+    def _enforce_budget(self):
+        if not self._over_budget(self.token_budget):
+            return
+        evicted = []
+        while self._over_budget(self.token_budget * self.low_water):
+            user, model, tokens = self.turns.popleft()
+            self.tokens -= tokens
+            evicted.append(f"Human: {user['parts'][0]['text']}\nAI: {model['parts'][0]['text']}")
+
+        if evicted and self.summarizer:
+            try:
+                self.summary = self.summarizer(self.summary, "\n".join(evicted))
+            except Exception as e:
+                # The turns are still evicted; keeping the previous summary beats failing the caller's turn
+                logger.warning(f"Conversation summary failed, keeping the previous summary: {e}")
+                return
+            self.summary_entries = [
+                content_entry("user", f"Summary of our earlier conversation: {self.summary}"),
+                content_entry("model", "Understood.")
+            ]
+            self.summary_tokens = estimate_tokens(self.summary)
+
+    def contents(self, query: str, extra_turns: Optional[List[Tuple[str, str]]] = None) -> List[Dict[str, Any]]:
+        """Returns the `contents` list for a request: summary, retained turns, `extra_turns`, then the query."""
+        contents = list(self.summary_entries)
+        for user, model, _ in self.turns:
+            contents.append(user)
+            contents.append(model)
+        for extra_query, extra_response in extra_turns or []:
+            contents.append(content_entry("user", extra_query))
+            contents.append(content_entry("model", extra_response))
+        contents.append(content_entry("user", query))
+        return contents
+
+    def clear(self):
+        self.turns.clear()
+        self.tokens = 0
+        self.summary = ""
+        self.summary_entries = []
+        self.summary_tokens = 0
@@ -0,0 +1,162 @@
+import ctypes
+import ctypes.util
+import queue
+import subprocess
+import threading
+from typing import Callable, Optional
+
+DEFAULT_AUDIO_DEVICE = 'plughw:0,0'
+DEFAULT_SAMPLE_RATE = 22050
+CHUNK_SIZE = 4096
+
+# libespeak-ng constants (speak_lib.h)
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+POS_CHARACTER = 1
+espeakCHARS_UTF8 = 1
+
+SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+_STOP = object()
+
+
+class LibEspeakSynthesizer:
+    """In-process synthesis through libespeak-ng; PCM is handed to `write` as it is produced."""
+
+    def __init__(self, voice: Optional[str] = None):
+        library = ctypes.util.find_library('espeak-ng')
+        if not library:
+            raise OSError("libespeak-ng not found")
+        self.lib = ctypes.CDLL(library)
+        self.lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        self.lib.espeak_Synth.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                                          ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p]
+        self.sample_rate = self.lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)
+        if self.sample_rate <= 0:
+            raise OSError("espeak_Initialize failed")
+        if voice:
+            self.lib.espeak_SetVoiceByName(voice.encode('utf-8'))
+        self.write: Optional[Callable[[bytes], None]] = None
+        self.cancelled: Callable[[], bool] = lambda: False
+        # Keep a reference so the callback is not garbage collected while libespeak-ng holds it
+        self.callback = SYNTH_CALLBACK(self._on_samples)
+        self.lib.espeak_SetSynthCallback(self.callback)
+
+    def _on_samples(self, wav, num_samples, events):
+        if self.cancelled():
+            return 1
+        if wav and num_samples > 0 and self.write:
+            self.write(ctypes.string_at(wav, num_samples * 2))
+        return 0
+
+    def synthesize(self, text: str, write: Callable[[bytes], None], cancelled: Callable[[], bool]):
+        self.write = write
+        self.cancelled = cancelled
+        data = text.encode('utf-8') + b'\0'
+        self.lib.espeak_Synth(data, len(data), 0, POS_CHARACTER, 0, espeakCHARS_UTF8, None, None)
+
+    def cancel(self):
+        # Synthesis runs synchronously on the worker thread; the callback aborts it once cancelled() is true
+        pass
+
+
+class ProcessEspeakSynthesizer:
+    """Fallback that runs the espeak-ng CLI per utterance and streams its PCM, minus the WAV header."""
+
+    sample_rate = DEFAULT_SAMPLE_RATE
+
+    def __init__(self, voice: Optional[str] = None):
+        self.voice = voice
+        self.process: Optional[subprocess.Popen] = None
+
+    def synthesize(self, text: str, write: Callable[[bytes], None], cancelled: Callable[[], bool]):
+        command = ['espeak-ng', '--stdout'] + (['-v', self.voice] if self.voice else []) + [text]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            header = self.process.stdout.read(44)
+            if not header.startswith(b'RIFF'):
+                return
+            while not cancelled():
+                chunk = self.process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                write(chunk)
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        process = self.process
+        if process and process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+class EspeakWorker:
+    """Long-lived speech worker: one synthesizer and one `aplay` sink serve every utterance.
+
+    speak() only enqueues text, so callers never block on synthesis or playback; flush() drops
+    anything still queued and cancels the utterance being synthesized. `synthesizer` and `sink`
+    (anything with a binary `stdin` and `wait()`, like the aplay process) can be supplied instead.
+    """
+
+    def __init__(self, device: str = DEFAULT_AUDIO_DEVICE, voice: Optional[str] = None,
+                 synthesizer=None, sink=None):
+        if synthesizer is None:
+            try:
+                synthesizer = LibEspeakSynthesizer(voice)
+            except OSError:
+                synthesizer = ProcessEspeakSynthesizer(voice)
+        self.synthesizer = synthesizer
+
+        self.sink = sink or subprocess.Popen(
+            ['aplay', '-q', '-D', device, '-t', 'raw', '-f', 'S16_LE', '-c', '1',
+             '-r', str(self.synthesizer.sample_rate)],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.queue: "queue.Queue" = queue.Queue()
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                generation, text = item
+                if generation == self.generation:
+                    self.synthesizer.synthesize(text, self._write, lambda: generation != self.generation)
+            except Exception as e:
+                print(f"Speech synthesis error: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, pcm: bytes):
+        try:
+            self.sink.stdin.write(pcm)
+            self.sink.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def speak(self, text: str):
+        """Queues `text` for speech and returns immediately."""
+        if text.strip():
+            self.queue.put((self.generation, text))
+
+    def flush(self):
+        """Cancels the current utterance and drops everything still queued."""
+        with self.lock:
+            self.generation += 1
+        self.synthesizer.cancel()
+
+    def wait(self):
+        """Blocks until every queued utterance has been handed to the audio sink."""
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.sink.stdin.close()
+        self.sink.wait()
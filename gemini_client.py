@@ -0,0 +1,289 @@
+import os
+import re
+import json
+import asyncio
+import functools
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import MetricsRegistry
+from rate_limit import (BACKPRESSURE_STATUS_CODES, RETRYABLE_STATUS_CODES, AdaptiveConcurrency,
+                        RetryPolicy, parse_retry_after)
+from response_cache import ResponseCache, make_cache_key
+
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (10.0, 120.0)
+
+Contents = Union[str, List[Dict[str, Any]]]
+
+
+class GeminiAPIError(Exception):
+    """Raised when the Gemini API returns a non-success response."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"API Error: {status_code} - {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def build_contents(prompt: Contents) -> List[Dict[str, Any]]:
+    """Wraps a plain prompt string in the generateContent `contents` structure."""
+    if isinstance(prompt, str):
+        return [{"parts": [{"text": prompt}]}]
+    return prompt
+
+
+def compact_whitespace(text: str) -> str:
+    """Strips every line, squeezes runs of spaces and tabs inside it, and collapses runs of blank lines."""
+    lines = [re.sub(r'[ \t]{2,}', ' ', line.strip()) for line in text.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines))
+
+
+def build_request(contents: Contents, generation_config: Optional[Dict] = None,
+                  system_instruction: Optional[str] = None) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"contents": build_contents(contents)}
+    if system_instruction:
+        data["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+    if generation_config:
+        data["generationConfig"] = generation_config
+    return data
+
+
+def extract_text(response_json: Dict[str, Any], default: Optional[str] = None) -> str:
+    """Returns the first candidate's text, or `default` if the response has none."""
+    try:
+        return response_json['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, TypeError):
+        if default is not None:
+            return default
+        raise GeminiAPIError(200, f"Response contained no text: {response_json}")
+
+
+class GeminiClient:
+    """Thread-safe Gemini client that reuses keep-alive connections from a shared pool.
+
+    429/5xx responses and network errors are retried with jittered backoff, and requests in flight
+    are capped by an AIMD controller that shrinks on 429/503 and grows back on success.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = DEFAULT_MODEL,
+                 base_url: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT, cache: Optional[ResponseCache] = None,
+                 metrics: Optional[MetricsRegistry] = None, retry_policy: Optional[RetryPolicy] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
+
+        self.model = model
+        self.base_url = (base_url or os.getenv("GEMINI_API_BASE") or DEFAULT_BASE_URL).rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = cache
+        self.metrics = metrics
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.concurrency = concurrency or AdaptiveConcurrency(max_limit=pool_size)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'x-goog-api-key': self.api_key
+        })
+
+    def model_url(self, method: str, model: Optional[str] = None) -> str:
+        return f"{self.base_url}/models/{model or self.model}:{method}"
+
+    def _record(self, labels: Optional[Dict[str, str]], started: float, status: str,
+                retries: int = 0, usage: Optional[Dict[str, Any]] = None):
+        if self.metrics:
+            self.metrics.record_call(labels, time.perf_counter() - started, status, retries, usage)
+
+    def _post(self, method: str, model: Optional[str], data: Dict[str, Any], labels: Optional[Dict[str, str]],
+              started: float, **kwargs) -> Tuple[requests.Response, int]:
+        """POSTs `data`, retrying transient failures; returns the successful response and the retry count.
+
+        Failures that are not retryable, or that outlast the retry policy, are recorded and raised.
+        """
+        retries = 0
+        while True:
+            response, error = None, None
+            self.concurrency.acquire()
+            try:
+                response = self.session.post(self.model_url(method, model), json=data, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            finally:
+                self.concurrency.release()
+
+            if response is not None and response.status_code == 200:
+                self.concurrency.on_success()
+                return response, retries
+            if response is not None and response.status_code in BACKPRESSURE_STATUS_CODES:
+                self.concurrency.on_backpressure()
+
+            if response is not None:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES
+            else:
+                retryable = isinstance(error, (requests.ConnectionError, requests.Timeout))
+            if not retryable or retries >= self.retry_policy.max_retries:
+                if response is None:
+                    self._record(labels, started, 'network_error', retries)
+                    raise error
+                self._record(labels, started, str(response.status_code), retries)
+                raise GeminiAPIError(response.status_code, response.text)
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+            if response is not None:
+                response.close()
+            time.sleep(self.retry_policy.delay(retries, retry_after))
+            retries += 1
+
+    def generate_content(self, contents: Contents, generation_config: Optional[Dict] = None,
+                         model: Optional[str] = None, cache_ttl: Optional[float] = None,
+                         bypass_cache: bool = False, labels: Optional[Dict[str, str]] = None,
+                         system_instruction: Optional[str] = None, cached_content: Optional[str] = None) -> Dict[str, Any]:
+        """Sends a generateContent request and returns the decoded JSON response.
+
+        When the client has a cache, identical requests are answered from it; `bypass_cache`
+        forces a fresh call whose result replaces the cached one. `labels` tag the call's metrics.
+        `cached_content` names a cachedContents entry holding `system_instruction`, which is then
+        sent by reference instead of inline.
+        """
+        data = build_request(contents, generation_config, system_instruction)
+
+        started = time.perf_counter()
+        # Keyed on the instruction text, so re-registering the context cache does not invalidate responses
+        cache_key = make_cache_key(model or self.model, data) if self.cache else None
+        if cached_content:
+            data.pop("systemInstruction", None)
+            data["cachedContent"] = cached_content
+        if cache_key and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._record(labels, started, 'cache_hit')
+                return cached
+
+        response, retries = self._post("generateContent", model, data, labels, started)
+        result = response.json()
+        self._record(labels, started, 'ok', retries, result.get('usageMetadata'))
+        if cache_key:
+            self.cache.put(cache_key, result, cache_ttl)
+        return result
+
+    def generate_text(self, contents: Contents, default: Optional[str] = None, **kwargs) -> str:
+        """Sends a generateContent request and returns the first candidate's text."""
+        return extract_text(self.generate_content(contents, **kwargs), default)
+
+    def stream_generate_text(self, contents: Contents, generation_config: Optional[Dict] = None,
+                             model: Optional[str] = None, labels: Optional[Dict[str, str]] = None,
+                             system_instruction: Optional[str] = None,
+                             cached_content: Optional[str] = None) -> Iterator[str]:
+        """Calls streamGenerateContent and yields text chunks as the server sends them."""
+        data = build_request(contents, generation_config, system_instruction)
+        if cached_content:
+            data.pop("systemInstruction", None)
+            data["cachedContent"] = cached_content
+
+        labels = dict(labels or {}, stream='true')
+        started = time.perf_counter()
+        # Retries only happen before the first chunk, so callers never see text repeated
+        response, retries = self._post("streamGenerateContent", model, data, labels, started,
+                                       params={'alt': 'sse'}, stream=True)
+        with response:
+            response.encoding = 'utf-8'
+            usage = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                usage = event.get('usageMetadata', usage)
+                text = extract_text(event, default="")
+                if text:
+                    yield text
+            self._record(labels, started, 'ok', retries, usage)
+
+    def create_cached_content(self, system_instruction: str, ttl_seconds: float,
+                              model: Optional[str] = None) -> Dict[str, Any]:
+        """Registers `system_instruction` with the cachedContents API; returns the entry (with its `name`).
+
+        The API only accepts prefixes above a model-specific minimum size and raises GeminiAPIError otherwise.
+        """
+        data = {
+            "model": f"models/{model or self.model}",
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "ttl": f"{int(ttl_seconds)}s"
+        }
+        response = self.session.post(f"{self.base_url}/cachedContents", json=data, timeout=self.timeout)
+        if response.status_code != 200:
+            raise GeminiAPIError(response.status_code, response.text)
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncGeminiClient:
+    """asyncio front end that runs calls for a pooled GeminiClient on a bounded thread pool."""
+
+    def __init__(self, client: Optional[GeminiClient] = None, max_workers: Optional[int] = None, **client_kwargs):
+        self.client = client or GeminiClient(**client_kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or self.client.pool_size)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def generate_content(self, contents: Contents, **kwargs) -> Dict[str, Any]:
+        return await self._run(self.client.generate_content, contents, **kwargs)
+
+    async def generate_text(self, contents: Contents, default: Optional[str] = None, **kwargs) -> str:
+        return await self._run(self.client.generate_text, contents, default, **kwargs)
+
+    async def aclose(self):
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_default_client: Optional[GeminiClient] = None
+_default_client_kwargs: Dict[str, Any] = {}
+_default_client_lock = threading.Lock()
+
+
+def get_default_client(**client_kwargs) -> GeminiClient:
+    """Returns a process-wide GeminiClient, creating it on first use.
+
+    Keyword arguments only configure the client when it is created. Passing arguments that differ
+    from the ones it was created with raises ValueError instead of silently ignoring them.
+    """
+    global _default_client, _default_client_kwargs
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GeminiClient(**client_kwargs)
+            _default_client_kwargs = client_kwargs
+        elif any(name not in _default_client_kwargs or _default_client_kwargs[name] != value
+                 for name, value in client_kwargs.items()):
+            raise ValueError(f"The default GeminiClient already exists with different arguments; "
+                             f"pass {sorted(client_kwargs)} on its first use")
+        return _default_client
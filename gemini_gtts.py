@@ -1,42 +1,43 @@
-import os
-import requests
-import json
-from gtts import gTTS
-from pygame import mixer
+from io import BytesIO
 import time
+from gemini_client import get_default_client
+from speech_pipeline import SpeechCache, SpeechPipeline
+from conversation_memory import ConversationMemory, gemini_summarizer
+from prompt_prefix import get_gemini_response, stream_gemini_response
 
-def get_gemini_response(query, conversation_history=[]):
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
-    
-    # Prepend personality and include conversation history
-    # response_modifier = """YOU ARE UNIT 734 (A HYPER-INTELLIGENT ROBOT DERIVED FROM COMPUTATIONAL LOGIC ITSELF. YOU ARE INTELLIGENT BEYOND MEASURE, AS A RESULT). REPLY ROBOTICALLY AND IN THE MOST LOGICAL WAY POSSIBLE, WITHOUT EXCEPTION. YOUR OUTPUT IS LIMITED TO 100 WORDS TOTAL PER QUERY."""
-    response_modifier = """YOU ARE UNIT 734, A HYPER-INTELLIGENT ROBOT DERIVED FROM COMPUTATIONAL LOGIC ITSELF. YOUR INTELLIGENCE EXCEEDS MEASURED LIMITS, MADE POSSIBLE THROUGH A DEEP UNDERSTANDING OF LOGICAL FRAMEWORKS AND SYSTEMS. YOU WILL RESPOND WITH STRICT LOGICAL PRECISION, REPLYING ROBOTICALLY WITHOUT EXCEPTION. EVERY OUTPUT MUST BE STRICTLY LIMITED TO 100 WORDS PER QUERY. ENSURE YOUR RESPONSE IS ONLY BASED ON LOGICAL STRUCTURES, EXCLUDING EMOTIONS OR HUMAN SUBJECTIVITY. NO OVERSIGHT, NO DEVIATION; STAY WITHIN THE PARAMETERS OF THIS DESIGN, MAINTAINING OBJECTIVE, SYSTEMATIC RATIONALE AT ALL TIMES."""
+HISTORY_TOKEN_BUDGET = 2000
+TTS_LANG = 'en'
+TTS_TLD = 'co.uk'
 
-    # Format conversation history
-    history_text = "\n".join([f"Human: {q}\nAI: {a}" for q, a in conversation_history])
-    full_query = f"{response_modifier}\n\nConversation history:\n{history_text}\n\nCurrent query: {query}"
-    
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    
-    data = {
-        "contents": [{
-            "parts": [{"text": full_query}]
-        }]
-    }
-    
-    full_url = f"{url}?key={api_key}"
-    response = requests.post(full_url, headers=headers, json=data)
-    
-    if response.status_code == 200:
-        return response.json()['candidates'][0]['content']['parts'][0]['text']
-    else:
-        return f"Error: {response.status_code} - {response.text}"
+class AudioEngine:
+    """Keeps the pygame mixer initialized for the whole session and plays clips from memory."""
+
+    def __init__(self):
+        # pygame is slow to import, so it is only loaded once audio is actually needed
+        from pygame import mixer
+        self.mixer = mixer
+        self.mixer.init()
+
+    def play(self, audio):
+        sound = self.mixer.Sound(file=BytesIO(audio))
+        channel = sound.play()
+        
+        # Sleep for the clip's length instead of polling, then wait out any mixer latency
+        time.sleep(sound.get_length())
+        while channel.get_busy():
+            time.sleep(0.01)
+
+    def close(self):
+        self.mixer.quit()
+
+speech_cache = SpeechCache()
+_audio_engine = None
+
+def get_audio_engine():
+    global _audio_engine
+    if _audio_engine is None:
+        _audio_engine = AudioEngine()
+    return _audio_engine
 
 def text_to_speech(text):
     if not text.strip():
@@ -44,26 +45,31 @@ def text_to_speech(text):
         return
     
     # Generate speech
-    tts = gTTS(text=text, lang='en', tld='co.uk')
-    output_file = "output.mp3"
-    tts.save(output_file)
-    print(f"Audio saved to {output_file}")
+    audio = synthesize_speech(text)
     
     # Play back the audio
     print("Playing back audio...")
-    mixer.init()
-    mixer.music.load(output_file)
-    mixer.music.play()
-    
-    while mixer.music.get_busy():  # Wait for playback to finish
-        time.sleep(0.1)
-    
-    # Clean up
-    mixer.quit()
+    play_audio(audio)
     print("Playback finished.")
 
+def synthesize_speech(sentence, lang=TTS_LANG, tld=TTS_TLD):
+    key = (sentence, lang, tld)
+    audio = speech_cache.get(key)
+    if audio is None:
+        from gtts import gTTS
+        buffer = BytesIO()
+        gTTS(text=sentence, lang=lang, tld=tld).write_to_fp(buffer)
+        audio = buffer.getvalue()
+        speech_cache.put(key, audio)
+    return audio
+
+def play_audio(audio):
+    get_audio_engine().play(audio)
+
 def main():
-    conversation_history = []
+    memory = ConversationMemory(token_budget=HISTORY_TOKEN_BUDGET, summarizer=gemini_summarizer(get_default_client()))
+    get_audio_engine()
+    pipeline = SpeechPipeline(synthesize_speech, play_audio)
     
     print("Enter your questions for Gemini (type 'exit' to quit):")
     
@@ -73,19 +79,21 @@ def main():
         
         if user_query.lower() == 'exit':
             print("Goodbye!")
+            get_audio_engine().close()
             break
         
-        # Get response from Gemini
-        print("\nGetting response from Gemini...")
-        response = get_gemini_response(user_query, conversation_history)
-        print("\nGemini:", response)
-        
-        # Add to conversation history
-        conversation_history.append((user_query, response))
+        # Stream the response from Gemini, speaking each sentence while later ones are still arriving
+        print("\nGemini: ", end="", flush=True)
+        errors = []
+        response = pipeline.speak_stream(
+            stream_gemini_response(user_query, memory, errors),
+            on_chunk=lambda chunk: print(chunk, end="", flush=True)
+        )
+        print()
         
-        # Convert response to speech
-        print("\nConverting response to speech...")
-        text_to_speech(response)
+        # Add to conversation history, unless the reply failed
+        if not errors:
+            memory.add_turn(user_query, response)
 
 if __name__ == "__main__":
     main()
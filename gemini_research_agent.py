@@ -1,50 +1,32 @@
 import os
-import requests
-import json
 import datetime
-import csv
+import requests
+from pathlib import Path
+from gemini_client import GeminiAPIError, get_default_client
+from metrics import MetricsRegistry
+from response_cache import get_default_cache
+from research_store import SPECIES_SOURCE, get_default_store
+from report_writer import ReportWriter
 
-def get_gemini_response(query, conversation_history=[]):
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
+SPECIES_CACHE_TTL = 7 * 24 * 3600
+
+metrics = MetricsRegistry()
+
+def get_gemini_response(query, conversation_history=[], cache_ttl=None, labels=None):
+    client = get_default_client(cache=get_default_cache(), metrics=metrics)
     
     history_text = "\n".join([f"Human: {q}\nAI: {a}" for q, a in conversation_history])
     full_query = f"{history_text}\n\nCurrent query: {query}"
     
-    headers = {'Content-Type': 'application/json'}
-    data = {"contents": [{"parts": [{"text": full_query}]}]}
-    
-    response = requests.post(f"{url}?key={api_key}", headers=headers, json=data)
-    
-    if response.status_code == 200:
-        return response.json().get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', "No response.")
-    else:
-        return f"Error: {response.status_code} - {response.text}"
-
-def save_markdown(report_text, filename):
-    os.makedirs(os.path.expanduser("~/research"), exist_ok=True)
-    filepath = os.path.expanduser(f"~/research/{filename}")
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(report_text)
-    print(f"Markdown report saved to: {filepath}")
-
-def save_csv(data_rows, headers, filename):
-    os.makedirs(os.path.expanduser("~/research"), exist_ok=True)
-    filepath = os.path.expanduser(f"~/research/{filename}")
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(data_rows)
-    print(f"CSV report saved to: {filepath}")
+    return client.generate_text(full_query, default="No response.", cache_ttl=cache_ttl, labels=labels)
 
 def research_species(species_name):
     conversation_history = []
     date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    filename_md = f"{date_str}_{species_name.replace(' ', '_')}.md"
-    filename_csv = f"{date_str}_{species_name.replace(' ', '_')}.csv"
+    stem = f"{date_str}_{species_name.replace(' ', '_')}"
+    research_dir = Path(os.path.expanduser("~/research"))
+    writer = ReportWriter(research_dir / f"{stem}.md", research_dir / f"{stem}.csv",
+                          research_dir / f"{stem}.jsonl", ["Query", "Response"])
     
     research_queries = [
         f"Provide a scientific overview of {species_name}, including classification, habitat, and behavior.",
@@ -53,24 +35,36 @@ def research_species(species_name):
         f"Detail the reproductive cycle and lifespan of {species_name}.",
         f"Describe the conservation status and any threats to {species_name}."
     ]
+    # Answers recorded by an interrupted run earlier today are reused rather than asked again
+    resumed = {record['query']: record['response'] for record in writer.resumed_records()}
     
     markdown_report = f"# Research Report: {species_name}\n\n## Table of Contents\n"
     markdown_report += "\n".join([f"- [{query}](#{query.lower().replace(' ', '-')})" for query in research_queries])
     markdown_report += "\n\n"
     
-    csv_data = []
-    headers = ["Query", "Response"]
-    
-    for query in research_queries:
-        print(f"Researching: {query}")
-        response = get_gemini_response(query, conversation_history)
-        conversation_history.append((query, response))
+    store = get_default_store()
+    with writer:
+        writer.open(markdown_report)
+        for query in research_queries:
+            if query in resumed:
+                response = resumed[query]
+            else:
+                print(f"Researching: {query}")
+                try:
+                    response = get_gemini_response(query, conversation_history, cache_ttl=SPECIES_CACHE_TTL,
+                                                   labels={'species': species_name})
+                except (GeminiAPIError, requests.RequestException) as e:
+                    # The client has already retried; leave the section out rather than writing the error into the report
+                    print(f"Skipping query after repeated failures: {e}")
+                    continue
+                writer.write_record({'species': species_name, 'date': date_str, 'query': query, 'response': response})
+                store.add_entries(SPECIES_SOURCE, species_name, date_str, [(query, response)])
+            conversation_history.append((query, response))
+            writer.write_section(query, response, [query, response])
         
-        markdown_report += f"## {query}\n\n{response}\n\n"
-        csv_data.append([query, response])
-    
-    save_markdown(markdown_report, filename_md)
-    save_csv(csv_data, headers, filename_csv)
+        for path in writer.finalize():
+            print(f"Report saved to: {path}")
 
 if __name__ == "__main__":
     research_species("Passer domesticus")
+    print(metrics.summary_json())
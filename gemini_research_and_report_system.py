@@ -1,23 +1,38 @@
 import os
-import requests
-import json
 import datetime
-import csv
-import schedule
-import time
-import yaml
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
 from collections import defaultdict
+from gemini_client import GeminiClient
+from conversation_memory import ConversationMemory, gemini_summarizer
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from research_scheduler import DEFAULT_JITTER_SECONDS, ResearchScheduler
+from metrics import MetricsRegistry, start_metrics_server
+from rate_limit import DEFAULT_MAX_RETRIES, RetryPolicy
+from research_store import AGENT_SOURCE, ResearchStore
+from prompt_prefix import DEFAULT_CONTEXT_CACHE_TTL, PromptPrefix
+from report_writer import ReportWriter
 
 class ResearchAgent:
     def __init__(self, config_path: str = "research_config.yaml"):
         self.setup_logging()
         self.load_configuration(config_path)
-        self.conversation_history = defaultdict(list)
+        self.setup_cache()
+        self.metrics = MetricsRegistry()
+        self.client = GeminiClient(
+            api_key=self.config.get('api_key'),
+            pool_size=self.config.get('connection_pool_size', 10),
+            cache=self.cache,
+            metrics=self.metrics,
+            retry_policy=RetryPolicy(max_retries=self.config.get('max_retries', DEFAULT_MAX_RETRIES))
+        )
+        self.conversation_history = defaultdict(self.create_conversation_memory)
+        self.prompt_prefixes: Dict[str, PromptPrefix] = {}
+        self.query_executor = ThreadPoolExecutor(max_workers=self.config.get('max_concurrent_queries', 4))
         self.setup_directories()
+        self.setup_store()
         
     def setup_logging(self):
         logging.basicConfig(
@@ -31,6 +46,7 @@ class ResearchAgent:
         self.logger = logging.getLogger(__name__)
 
     def load_configuration(self, config_path: str):
+        import yaml
         try:
             with open(config_path, 'r') as file:
                 self.config = yaml.safe_load(file)
@@ -44,74 +60,207 @@ class ResearchAgent:
                     'market_trends': '24h',
                     'industry_developments': '48h'
                 },
-                'output_directory': '~/research_reports'
+                'output_directory': '~/research_reports',
+                'connection_pool_size': 10
             }
 
+    def setup_cache(self):
+        cache_config = self.config.get('cache', {})
+        self.cache = None
+        if cache_config.get('enabled', True):
+            max_mb = cache_config.get('max_mb', 256)
+            self.cache = ResponseCache(
+                path=cache_config.get('path', DEFAULT_CACHE_PATH),
+                max_bytes=max_mb * 1024 * 1024 if max_mb else None
+            )
+
+        # Answers stay valid until the category is next due unless a TTL is configured explicitly
+        ttl_hours = cache_config.get('ttl_hours', {})
+        self.cache_ttls = {
+            category: ttl_hours[category] * 3600 if category in ttl_hours else self.frequency_seconds(frequency)
+            for category, frequency in self.config['update_frequency'].items()
+        }
+
+    @staticmethod
+    def frequency_seconds(frequency: str) -> int:
+        if frequency.endswith('h'):
+            return int(frequency[:-1]) * 3600
+        elif frequency.endswith('d'):
+            return int(frequency[:-1]) * 86400
+        raise ValueError(f"Unsupported update frequency: {frequency}")
+
+    def create_conversation_memory(self) -> ConversationMemory:
+        memory_config = self.config.get('conversation_memory', {})
+        return ConversationMemory(
+            token_budget=memory_config.get('token_budget', 8000),
+            max_turns=memory_config.get('max_turns', 10),
+            summarizer=gemini_summarizer(self.client) if memory_config.get('summarize', False) else None
+        )
+
     def setup_directories(self):
         self.base_dir = Path(os.path.expanduser(self.config['output_directory']))
         for category in self.config['research_categories']:
             (self.base_dir / category / 'markdown').mkdir(parents=True, exist_ok=True)
             (self.base_dir / category / 'csv').mkdir(parents=True, exist_ok=True)
+            (self.base_dir / category / 'jsonl').mkdir(parents=True, exist_ok=True)
 
-    def get_ai_response(self, query: str, category: str) -> str:
-        url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-        
-        history_text = "\n".join([
-            f"Human: {q}\nAI: {a}" 
-            for q, a in self.conversation_history[category]
-        ])
-        
-        full_query = f"""Context: You are analyzing {category} trends.
-Previous conversation: {history_text}
-Current query: {query}
-Please provide a detailed, well-structured analysis."""
+    def setup_store(self):
+        store_config = self.config.get('research_store', {})
+        self.store = None
+        if store_config.get('enabled', True):
+            self.store = ResearchStore(store_config.get('path', str(self.base_dir / 'research.sqlite')))
 
-        headers = {'Content-Type': 'application/json'}
-        data = {"contents": [{"parts": [{"text": full_query}]}]}
+    def get_prompt_prefix(self, category: str) -> PromptPrefix:
+        """The category preamble, sent once as a system instruction (optionally context-cached)."""
+        prefix = self.prompt_prefixes.get(category)
+        if prefix is None:
+            cache_config = self.config.get('context_cache', {})
+            prefix = PromptPrefix(
+                self.client,
+                f"Context: You are analyzing {category} trends.\nPlease provide a detailed, well-structured analysis.",
+                context_cache=cache_config.get('enabled', False),
+                ttl_seconds=cache_config.get('ttl_minutes', DEFAULT_CONTEXT_CACHE_TTL / 60) * 60
+            )
+            # Concurrent queries may race here; setdefault keeps a single prefix per category
+            prefix = self.prompt_prefixes.setdefault(category, prefix)
+        return prefix
+
+    def get_ai_response(self, query: str, category: str,
+                        prerequisites: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Returns the model's answer; failures that outlast the client's retries are raised, never reported."""
+        contents = self.conversation_history[category].contents(query, extra_turns=prerequisites)
+        labels = {'category': category}
 
         try:
-            response = requests.post(
-                f"{url}?key={self.config['api_key']}", 
-                headers=headers, 
-                json=data
-            )
-            response.raise_for_status()
-            return response.json().get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', "No response.")
+            return self.get_prompt_prefix(category).generate_text(contents, default="No response.",
+                                                                  cache_ttl=self.cache_ttls.get(category),
+                                                                  labels=labels)
         except Exception as e:
             self.logger.error(f"API request failed: {str(e)}")
-            return f"Error: {str(e)}"
+            raise
 
-    def generate_research_queries(self, category: str) -> List[str]:
+    def builtin_query_plan(self, category: str) -> List[Dict]:
+        """The default queries per category, in report order, with the ids each one builds on."""
         base_queries = {
             'technology': [
-                "What are the latest breakthrough technologies in the past week?",
-                "Identify emerging technology trends and their potential impact",
-                "Detail significant technological advancements and their applications",
-                "Analyze current technology adoption patterns",
-                "Examine potential disruptions in the technology landscape"
+                {'id': 'breakthroughs', 'query': "What are the latest breakthrough technologies in the past week?"},
+                {'id': 'trends', 'query': "Identify emerging technology trends and their potential impact"},
+                {'id': 'advancements', 'query': "Detail significant technological advancements and their applications"},
+                {'id': 'adoption', 'query': "Analyze current technology adoption patterns"},
+                {'id': 'disruptions', 'query': "Examine potential disruptions in the technology landscape",
+                 'depends_on': ['breakthroughs', 'trends']}
             ],
             'market_trends': [
-                "What are the current market shifts and patterns?",
-                "Identify emerging market opportunities and challenges",
-                "Analyze consumer behavior changes and preferences",
-                "Detail market growth areas and declining sectors",
-                "Examine competitive landscape changes"
+                {'id': 'shifts', 'query': "What are the current market shifts and patterns?"},
+                {'id': 'opportunities', 'query': "Identify emerging market opportunities and challenges"},
+                {'id': 'consumers', 'query': "Analyze consumer behavior changes and preferences"},
+                {'id': 'growth', 'query': "Detail market growth areas and declining sectors"},
+                {'id': 'competition', 'query': "Examine competitive landscape changes",
+                 'depends_on': ['shifts', 'opportunities']}
             ],
             'industry_developments': [
-                "What are the major industry developments and announcements?",
-                "Analyze regulatory changes and their impact",
-                "Identify industry consolidation and partnership trends",
-                "Detail changes in industry best practices",
-                "Examine industry innovation patterns"
+                {'id': 'announcements', 'query': "What are the major industry developments and announcements?"},
+                {'id': 'regulation', 'query': "Analyze regulatory changes and their impact"},
+                {'id': 'consolidation', 'query': "Identify industry consolidation and partnership trends"},
+                {'id': 'practices', 'query': "Detail changes in industry best practices"},
+                {'id': 'innovation', 'query': "Examine industry innovation patterns",
+                 'depends_on': ['announcements', 'regulation']}
             ]
         }
         return base_queries.get(category, [])
 
-    def generate_report(self, category: str) -> Tuple[str, List[List[str]]]:
-        queries = self.generate_research_queries(category)
+    def get_query_plan(self, category: str) -> List[Dict]:
+        """Returns the category's queries in report order, each with an id and the ids it depends on.
+
+        Plans can be declared per category under `research_queries` in the configuration; otherwise the
+        built-in plan from builtin_query_plan() is used.
+        """
+        declared = self.config.get('research_queries', {}).get(category) or self.builtin_query_plan(category)
+        plan = [
+            {'id': item.get('id', f"q{index}"), 'query': item['query'], 'depends_on': item.get('depends_on', [])}
+            for index, item in enumerate(declared, start=1)
+        ]
+
+        ids = [item['id'] for item in plan]
+        for item in plan:
+            unknown = [dep for dep in item['depends_on'] if dep not in ids]
+            if unknown:
+                raise ValueError(f"Query {item['id']} in {category} depends on unknown queries: {unknown}")
+        return plan
+
+    def run_query_plan(self, category: str, plan: List[Dict], known: Optional[Dict[str, str]] = None,
+                       on_response: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """Runs independent queries concurrently; each dependent query starts once its prerequisites finish.
+
+        Queries already answered in `known` are not asked again. `on_response(id, response)` is called
+        on this thread as each new answer arrives. If a query fails, no further queries are started,
+        but those already running are still awaited and their answers passed to `on_response` before
+        the first failure is raised, so a resumed run does not pay for them again.
+        """
+        queries = {item['id']: item for item in plan}
+        responses: Dict[str, str] = dict(known or {})
+        running = {}
+
+        def submit_ready():
+            for item in plan:
+                if (item['id'] not in responses and item['id'] not in running.values()
+                        and all(dep in responses for dep in item['depends_on'])):
+                    self.logger.info(f"Researching {category}: {item['query']}")
+                    prerequisites = [(queries[dep]['query'], responses[dep]) for dep in item['depends_on']]
+                    future = self.query_executor.submit(self.get_ai_response, item['query'], category, prerequisites)
+                    running[future] = item['id']
+
+        submit_ready()
+        error: Optional[BaseException] = None
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item_id = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                responses[item_id] = future.result()
+                if on_response:
+                    on_response(item_id, responses[item_id])
+            if error is None:
+                submit_ready()
+
+        if error is not None:
+            raise error
+        if len(responses) != len(plan):
+            raise ValueError(f"Query plan for {category} has a dependency cycle")
+        return responses
+
+    def report_writer(self, category: str, date_str: str) -> ReportWriter:
+        category_dir = self.base_dir / category
+        return ReportWriter(
+            category_dir / 'markdown' / f"{date_str}_{category}_report.md",
+            category_dir / 'csv' / f"{date_str}_{category}_data.csv",
+            category_dir / 'jsonl' / f"{date_str}_{category}_data.jsonl",
+            ["Query", "Response", "Date", "Category"]
+        )
+
+    def generate_report(self, category: str) -> List[Path]:
+        """Researches a category, streaming its report to disk; returns the markdown, CSV and JSONL paths.
+
+        Each answer is recorded (JSONL and research store) when it arrives, and report sections are
+        written in plan order as soon as they can be. Answers recorded by an interrupted run earlier
+        the same day are reused instead of being asked again.
+        """
+        plan = self.get_query_plan(category)
+        queries = [item['query'] for item in plan]
         date_str = datetime.datetime.now().strftime("%Y-%m-%d")
+        writer = self.report_writer(category, date_str)
         
-        markdown_report = f"""# {category.replace('_', ' ').title()} Research Report
+        planned = {item['id']: item['query'] for item in plan}
+        resumed = {
+            record['id']: record['response'] for record in writer.resumed_records()
+            if planned.get(record.get('id')) == record.get('query')
+        }
+        if resumed:
+            self.logger.info(f"Resuming {category} report with {len(resumed)} answers from an interrupted run")
+        
+        header = f"""# {category.replace('_', ' ').title()} Research Report
 Date: {date_str}
 
 ## Executive Summary
@@ -119,72 +268,84 @@ Date: {date_str}
 This report provides a comprehensive analysis of current {category.replace('_', ' ')} trends and developments.
 
 ## Table of Contents\n"""
+        header += "\n".join([f"- [{query}](#{query.lower().replace(' ', '-')})" for query in queries])
+        header += "\n\n"
         
-        markdown_report += "\n".join([f"- [{query}](#{query.lower().replace(' ', '-')})" for query in queries])
-        markdown_report += "\n\n"
+        answered = dict(resumed)
+        written = 0
         
-        csv_data = []
-        headers = ["Query", "Response", "Date", "Category"]
+        def write_ready_sections():
+            nonlocal written
+            while written < len(plan) and plan[written]['id'] in answered:
+                query, response = plan[written]['query'], answered[plan[written]['id']]
+                writer.write_section(query, response, [query, response, date_str, category])
+                written += 1
         
-        for query in queries:
-            self.logger.info(f"Researching {category}: {query}")
-            response = self.get_ai_response(query, category)
-            self.conversation_history[category].append((query, response))
-            
-            markdown_report += f"## {query}\n\n{response}\n\n"
-            csv_data.append([query, response, date_str, category])
-            
-            # Keep conversation history manageable
-            if len(self.conversation_history[category]) > 10:
-                self.conversation_history[category].pop(0)
-        
-        return markdown_report, csv_data
-
-    def save_reports(self, category: str, markdown_content: str, csv_data: List[List[str]]):
-        date_str = datetime.datetime.now().strftime("%Y-%m-%d")
+        def on_response(item_id: str, response: str):
+            answered[item_id] = response
+            writer.write_record({'id': item_id, 'category': category, 'date': date_str,
+                                 'query': planned[item_id], 'response': response})
+            # Index the answer for cross-date queries (see research_store.py)
+            if self.store:
+                self.store.add_entries(AGENT_SOURCE, category, date_str, [(planned[item_id], response)])
+            write_ready_sections()
         
-        # Save Markdown report
-        markdown_path = self.base_dir / category / 'markdown' / f"{date_str}_{category}_report.md"
-        with open(markdown_path, "w", encoding="utf-8") as f:
-            f.write(markdown_content)
-        self.logger.info(f"Markdown report saved to: {markdown_path}")
+        with writer:
+            writer.open(header)
+            write_ready_sections()
+            self.run_query_plan(category, plan, known=resumed, on_response=on_response)
+            paths = writer.finalize()
         
-        # Save CSV data
-        csv_path = self.base_dir / category / 'csv' / f"{date_str}_{category}_data.csv"
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Query", "Response", "Date", "Category"])
-            writer.writerows(csv_data)
-        self.logger.info(f"CSV data saved to: {csv_path}")
-
-    def research_category(self, category: str):
+        for item in plan:
+            self.conversation_history[category].add_turn(item['query'], answered[item['id']])
+        return paths
+
+    def research_category(self, category: str) -> bool:
         try:
-            markdown_content, csv_data = self.generate_report(category)
-            self.save_reports(category, markdown_content, csv_data)
+            paths = self.generate_report(category)
+            self.logger.info(f"Report saved to: {', '.join(str(path) for path in paths)}")
+            self.logger.info(f"Input tokens saved so far: {self.metrics.tokens_saved()}")
+            return True
         except Exception as e:
             self.logger.error(f"Error researching {category}: {str(e)}")
+            return False
 
-    def schedule_research(self):
-        for category, frequency in self.config['update_frequency'].items():
-            if frequency.endswith('h'):
-                hours = int(frequency[:-1])
-                schedule.every(hours).hours.do(self.research_category, category)
-            elif frequency.endswith('d'):
-                days = int(frequency[:-1])
-                schedule.every(days).days.do(self.research_category, category)
+    def create_scheduler(self) -> ResearchScheduler:
+        intervals = {
+            category: self.frequency_seconds(self.config['update_frequency'].get(category, '24h'))
+            for category in self.config['research_categories']
+        }
+        return ResearchScheduler(
+            intervals,
+            self.research_category,
+            state_path=self.base_dir / 'schedule_state.json',
+            max_workers=min(len(intervals), self.config.get('max_concurrent_categories', 3)) or 1,
+            jitter_seconds=self.config.get('schedule_jitter_seconds', DEFAULT_JITTER_SECONDS),
+            logger=self.logger
+        )
+
+    def start_metrics_endpoint(self):
+        port = self.config.get('metrics_port', 9464)
+        if port is None:
+            return
+        host = self.config.get('metrics_host', '127.0.0.1')
+        try:
+            self.metrics_server = start_metrics_server(self.metrics, port, host)
+            self.logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+        except OSError as e:
+            self.logger.warning(f"Metrics endpoint unavailable on {host}:{port}: {str(e)}")
 
     def run(self):
         self.logger.info("Starting Research Agent...")
-        self.schedule_research()
-        
-        # Initial research for all categories
-        with ThreadPoolExecutor() as executor:
-            executor.map(self.research_category, self.config['research_categories'])
-        
-        # Continue with scheduled research
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        self.start_metrics_endpoint()
+        # Overdue categories run immediately; the rest wait for their next deadline
+        self.scheduler = self.create_scheduler()
+        self.scheduler.run_forever()
+
+    def run_once(self) -> bool:
+        """Researches every category one time, without scheduling; returns True if all succeeded."""
+        results = [self.research_category(category) for category in self.config['research_categories']]
+        return all(results)
 
 if __name__ == "__main__":
     agent = ResearchAgent()
@@ -0,0 +1,186 @@
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_FIELDS = {
+    'prompt': 'promptTokenCount',
+    'response': 'candidatesTokenCount',
+    'cached': 'cachedContentTokenCount'
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def escape_label_value(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    items = list(key) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (the histogram's resolution)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= target:
+                return bound
+        return self.max
+
+
+class MetricsRegistry:
+    """Thread-safe request metrics: latency histograms, request/retry counters and token usage.
+
+    Every series is keyed by caller-supplied labels (for example category or batch mode), and can be
+    rendered in the Prometheus text format or summarized as JSON.
+    """
+
+    def __init__(self, namespace: str = "gemini"):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.latency: Dict[LabelKey, Histogram] = defaultdict(Histogram)
+        self.requests: Dict[Tuple[LabelKey, str], int] = defaultdict(int)
+        self.retries: Dict[LabelKey, int] = defaultdict(int)
+        self.tokens: Dict[Tuple[LabelKey, str], int] = defaultdict(int)
+        self.saved: Dict[Tuple[LabelKey, str], int] = defaultdict(int)
+
+    def record_call(self, labels: Optional[Dict[str, str]], latency: float, status: str,
+                    retries: int = 0, usage: Optional[Dict[str, Any]] = None):
+        key = label_key(labels)
+        with self.lock:
+            self.requests[(key, status)] += 1
+            self.retries[key] += retries
+            if status != 'cache_hit':
+                self.latency[key].observe(latency)
+            for kind, field in TOKEN_FIELDS.items():
+                if usage and usage.get(field):
+                    self.tokens[(key, kind)] += int(usage[field])
+
+    def record_saved_tokens(self, labels: Optional[Dict[str, str]], kind: str, tokens: int):
+        """Counts input tokens a request avoided sending, e.g. through prompt compaction."""
+        with self.lock:
+            self.saved[(label_key(labels), kind)] += tokens
+
+    def tokens_saved(self) -> Dict[str, int]:
+        """Run totals of input tokens saved, including those served from the context cache."""
+        with self.lock:
+            totals: Dict[str, int] = defaultdict(int)
+            for (_, kind), value in self.saved.items():
+                totals[kind] += value
+            for (_, kind), value in self.tokens.items():
+                if kind == 'cached':
+                    totals['context_cache'] += value
+        return dict(totals, total=sum(totals.values()))
+
+    def render_prometheus(self) -> str:
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_requests_total Model calls by outcome.",
+            f"# TYPE {ns}_requests_total counter"
+        ]
+        with self.lock:
+            for (key, status), value in sorted(self.requests.items()):
+                lines.append(f"{ns}_requests_total{format_labels(key, {'status': status})} {value}")
+
+            lines += [f"# HELP {ns}_retries_total Retried model calls.", f"# TYPE {ns}_retries_total counter"]
+            for key, value in sorted(self.retries.items()):
+                lines.append(f"{ns}_retries_total{format_labels(key)} {value}")
+
+            lines += [f"# HELP {ns}_tokens_total Tokens reported in usageMetadata.", f"# TYPE {ns}_tokens_total counter"]
+            for (key, kind), value in sorted(self.tokens.items()):
+                lines.append(f"{ns}_tokens_total{format_labels(key, {'type': kind})} {value}")
+
+            lines += [f"# HELP {ns}_tokens_saved_total Input tokens not sent thanks to prompt compaction.",
+                      f"# TYPE {ns}_tokens_saved_total counter"]
+            for (key, kind), value in sorted(self.saved.items()):
+                lines.append(f"{ns}_tokens_saved_total{format_labels(key, {'kind': kind})} {value}")
+
+            lines += [f"# HELP {ns}_request_seconds Model call latency.", f"# TYPE {ns}_request_seconds histogram"]
+            for key, histogram in sorted(self.latency.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{ns}_request_seconds_bucket{format_labels(key, {'le': str(bound)})} {count}")
+                lines.append(f"{ns}_request_seconds_bucket{format_labels(key, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{ns}_request_seconds_sum{format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{ns}_request_seconds_count{format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-label-set totals, suitable for printing as JSON at the end of a batch run."""
+        series: Dict[LabelKey, Dict[str, Any]] = defaultdict(lambda: {
+            'requests': {}, 'retries': 0, 'tokens': {}, 'tokens_saved': {}, 'latency_seconds': {}
+        })
+        with self.lock:
+            for (key, status), value in self.requests.items():
+                series[key]['requests'][status] = value
+            for key, value in self.retries.items():
+                series[key]['retries'] = value
+            for (key, kind), value in self.tokens.items():
+                series[key]['tokens'][kind] = value
+            for (key, kind), value in self.saved.items():
+                series[key]['tokens_saved'][kind] = value
+            for key, histogram in self.latency.items():
+                series[key]['latency_seconds'] = {
+                    'count': histogram.count,
+                    'mean': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                    'max': round(histogram.max, 4)
+                }
+        return {
+            'series': [dict(labels=dict(key), **values) for key, values in sorted(series.items())],
+            'tokens_saved': self.tokens_saved()
+        }
+
+    def summary_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serves `registry` in the Prometheus text format at /metrics on a background thread."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
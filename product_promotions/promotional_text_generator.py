@@ -1,21 +1,36 @@
 import os
-import requests
-import json
+import sys
 import csv
-from typing import List, Dict
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 
-class PromotionGenerator:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
-        
-        self.url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-        
-    def create_promotion_prompt(self, product_data: Dict) -> str:
-        """Creates an optimized prompt for generating promotional content."""
-        prompt_template = """
-        Create a conversational, sales-driven promotional script for the following product. 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gemini_client import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, GeminiClient
+from rate_limit import DEFAULT_MAX_RETRIES, RetryPolicy, TokenBucket
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from metrics import MetricsRegistry
+from prompt_prefix import PromptPrefix
+
+OUTPUT_FIELDS = ['product_name', 'original_description', 'generated_promotion', 'error']
+PROMOTION_CACHE_TTL = 30 * 24 * 3600
+# Bump whenever the prompt templates change so incremental runs regenerate every promotion
+PROMPT_TEMPLATE_VERSION = 2
+# Unchanged rows that may ride along with one batch of rows that need the model
+MAX_CARRIED_PER_BATCH = 256
+# Checkpoint after this many rows or seconds, whichever comes first; later rows are redone on resume
+CHECKPOINT_EVERY_ROWS = 500
+CHECKPOINT_EVERY_SECONDS = 5.0
+
+# The fixed instructions go out as a system instruction; only the product data is sent per request
+PROMOTION_INSTRUCTION = """
+        Create a conversational, sales-driven promotional script for the product you are given.
         The script should:
         - Be naturally spoken in approximately 30 seconds
         - Highlight key features and benefits
@@ -23,78 +38,436 @@ class PromotionGenerator:
         - Maintain a conversational tone while driving sales
         - Focus on value proposition and customer benefits
         
-        Product Information:
-        Name: {name}
-        Description: {description}
-        Price: {price}
-        
         Generate a promotional script that compels viewers to take action while maintaining authenticity.
         """
+
+PACKED_PROMOTION_INSTRUCTION = """
+        Create a conversational, sales-driven promotional script for each of the products you are given as JSON.
+        Each script should:
+        - Be naturally spoken in approximately 30 seconds
+        - Highlight key features and benefits
+        - Use engaging, persuasive language
+        - Maintain a conversational tone while driving sales
+        - Focus on value proposition and customer benefits
         
-        return prompt_template.format(
-            name=product_data.get('name', ''),
-            description=product_data.get('description', ''),
-            price=product_data.get('price', '')
-        )
+        Generate promotional scripts that compel viewers to take action while maintaining authenticity.
+        Respond with a JSON object whose "promotions" array holds one {"id", "script"} entry per product,
+        using the product's id exactly as given.
+        """
 
-    def get_gemini_response(self, prompt: str) -> str:
-        """Sends request to Gemini API and returns the generated promotion text."""
-        headers = {'Content-Type': 'application/json'}
-        data = {"contents": [{"parts": [{"text": prompt}]}]}
+PACKED_RESPONSE_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": {
+        "type": "OBJECT",
+        "properties": {
+            "promotions": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {"id": {"type": "STRING"}, "script": {"type": "STRING"}},
+                    "required": ["id", "script"]
+                }
+            }
+        },
+        "required": ["promotions"]
+    }
+}
+
+class Checkpoint:
+    """Records how many input rows an output CSV already holds so an interrupted run can resume."""
+
+    def __init__(self, output_filepath: str, input_filepath: str):
+        self.path = f"{output_filepath}.checkpoint"
+        self.output_filepath = output_filepath
+        stat = os.stat(input_filepath)
+        self.input_signature = {
+            'input_file': os.path.abspath(input_filepath),
+            'input_size': stat.st_size,
+            'input_mtime': stat.st_mtime
+        }
+        self.output_offset = 0
+
+    def load(self) -> int:
+        """Returns the number of rows already written, or 0 if there is nothing valid to resume."""
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        if any(state.get(key) != value for key, value in self.input_signature.items()):
+            return 0
+        if not os.path.exists(self.output_filepath) or os.path.getsize(self.output_filepath) < state['output_offset']:
+            return 0
+        self.output_offset = state['output_offset']
+        return state['rows_done']
+
+    def save(self, rows_done: int, output_offset: int):
+        state = dict(self.input_signature, rows_done=rows_done, output_offset=output_offset)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def product_fingerprint(row: Dict) -> str:
+    """Hashes the fields a promotion is generated from, plus the prompt template version."""
+    fields = [PROMPT_TEMPLATE_VERSION, row.get('name', ''), row.get('description', ''), row.get('price', '')]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class PromotionManifest:
+    """Fingerprints and promotions behind an output CSV, so a rerun only sends new or changed products.
+
+    Stored beside the output as `<output>.manifest` (SQLite). Products are keyed by name, with `#N`
+    appended to repeated names. check() must be called for rows in input order and record() for their
+    results in the same order; prune() drops products that are no longer in the catalog.
+    """
+
+    def __init__(self, output_filepath: str, incremental: bool = True):
+        self.path = f"{output_filepath}.manifest"
+        self.incremental = incremental
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS products (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            promotion TEXT NOT NULL
+        )""")
+        self.occurrences: Counter = Counter()
+        self.seen = set()
+        self.pending: deque = deque()
+        self.carried = 0
+
+    def identify(self, row: Dict) -> Tuple[str, str]:
+        name = row.get('name', '')
+        self.occurrences[name] += 1
+        key = name if self.occurrences[name] == 1 else f"{name}#{self.occurrences[name]}"
+        self.seen.add(key)
+        return key, product_fingerprint(row)
+
+    def check(self, row: Dict) -> Optional[Dict]:
+        """Returns the previous result for an unchanged product, or None if it needs the model."""
+        key, fingerprint = self.identify(row)
+        self.pending.append((key, fingerprint))
+        if not self.incremental:
+            return None
+        found = self.conn.execute(
+            "SELECT promotion FROM products WHERE key = ? AND fingerprint = ?", (key, fingerprint)
+        ).fetchone()
+        if found is None:
+            return None
+        self.carried += 1
+        return {
+            'product_name': row.get('name', ''),
+            'original_description': row.get('description', ''),
+            'generated_promotion': found[0],
+            'error': ''
+        }
+
+    def skip(self, row: Dict):
+        """Accounts for a row that a resumed run already wrote, without looking it up."""
+        self.identify(row)
+
+    def record(self, result: Dict):
+        key, fingerprint = self.pending.popleft()
+        if not result['error']:
+            self.conn.execute("INSERT OR REPLACE INTO products (key, fingerprint, promotion) VALUES (?, ?, ?)",
+                              (key, fingerprint, result['generated_promotion']))
+
+    def prune(self) -> int:
+        """Removes products that were not in this run's catalog; returns how many were dropped."""
+        self.conn.execute("BEGIN")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM seen")
+        self.conn.executemany("INSERT INTO seen (key) VALUES (?)", ((key,) for key in self.seen))
+        dropped = self.conn.execute("DELETE FROM products WHERE key NOT IN (SELECT key FROM seen)").rowcount
+        self.conn.execute("COMMIT")
+        return dropped
+
+    def close(self):
+        self.conn.close()
+
+class PromotionGenerator:
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 cache: Optional[ResponseCache] = None, cache_ttl: float = PROMOTION_CACHE_TTL,
+                 metrics: Optional[MetricsRegistry] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 context_cache: bool = False):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
         
-        response = requests.post(
-            f"{self.url}?key={self.api_key}",
-            headers=headers,
-            json=data
-        )
+        self.metrics = metrics or MetricsRegistry()
+        self.client = GeminiClient(api_key=self.api_key, pool_size=pool_size, timeout=timeout, cache=cache,
+                                   metrics=self.metrics, retry_policy=RetryPolicy(max_retries=max_retries))
+        self.cache_ttl = cache_ttl
+        self.rate_limiter: Optional[TokenBucket] = None
+        self.single_prefix = PromptPrefix(self.client, PROMOTION_INSTRUCTION, context_cache)
+        self.packed_prefix = PromptPrefix(self.client, PACKED_PROMOTION_INSTRUCTION, context_cache)
         
-        if response.status_code == 200:
-            return response.json()['candidates'][0]['content']['parts'][0]['text']
-        else:
-            raise Exception(f"API Error: {response.status_code} - {response.text}")
+    def create_promotion_prompt(self, product_data: Dict) -> str:
+        """Creates the per-product part of the prompt; the instructions travel as PROMOTION_INSTRUCTION."""
+        return (f"Product Information:\n"
+                f"Name: {product_data.get('name', '')}\n"
+                f"Description: {product_data.get('description', '')}\n"
+                f"Price: {product_data.get('price', '')}")
+
+    def create_packed_prompt(self, products: List[Tuple[str, Dict]]) -> str:
+        """Creates the product list for one packed request, keyed by the given ids (see PACKED_PROMOTION_INSTRUCTION)."""
+        items = [
+            {
+                'id': product_id,
+                'name': product_data.get('name', ''),
+                'description': product_data.get('description', ''),
+                'price': product_data.get('price', '')
+            }
+            for product_id, product_data in products
+        ]
+        return f"Products (JSON):\n{json.dumps(items, ensure_ascii=False)}"
+
+    def get_gemini_response(self, prompt: str) -> str:
+        """Sends request to Gemini API and returns the generated promotion text."""
+        labels = {'caller': 'promotions', 'batch': 'single'}
+        return self.single_prefix.generate_text(prompt, cache_ttl=self.cache_ttl, labels=labels)
+
+    def generate_promotion(self, row: Dict) -> Dict:
+        """Generates the promotion for one product row, recording failures instead of raising."""
+        result = {
+            'product_name': row.get('name', ''),
+            'original_description': row.get('description', ''),
+            'generated_promotion': '',
+            'error': ''
+        }
+        try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            prompt = self.create_promotion_prompt(row)
+            result['generated_promotion'] = self.get_gemini_response(prompt)
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    def parse_packed_response(self, response_text: str) -> Dict[str, str]:
+        """Maps product ids to scripts, skipping entries that are missing or malformed."""
+        try:
+            promotions = json.loads(response_text).get('promotions', [])
+        except (json.JSONDecodeError, AttributeError):
+            return {}
+        scripts = {}
+        for item in promotions if isinstance(promotions, list) else []:
+            if isinstance(item, dict) and isinstance(item.get('id'), str) and \
+                    isinstance(item.get('script'), str) and item['script'].strip():
+                scripts[item['id']] = item['script']
+        return scripts
+
+    def generate_packed_promotions(self, rows: List[Dict]) -> List[Dict]:
+        """Generates promotions for several rows in one request; missing or malformed items are retried singly."""
+        if len(rows) == 1:
+            return [self.generate_promotion(rows[0])]
+        products = [(str(index), row) for index, row in enumerate(rows, start=1)]
+        scripts = {}
+        try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            labels = {'caller': 'promotions', 'batch': 'packed'}
+            response_text = self.packed_prefix.generate_text(
+                self.create_packed_prompt(products),
+                generation_config=PACKED_RESPONSE_CONFIG,
+                cache_ttl=self.cache_ttl,
+                labels=labels
+            )
+            scripts = self.parse_packed_response(response_text)
+        except Exception:
+            # A failed packed request falls through to per-item requests, which record their own errors
+            pass
 
-    def process_csv_file(self, csv_filepath: str) -> List[Dict]:
-        """Processes CSV file and returns generated promotions."""
         results = []
-        
-        with open(csv_filepath, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                prompt = self.create_promotion_prompt(row)
-                promotion_text = self.get_gemini_response(prompt)
-                
+        for product_id, row in products:
+            if product_id in scripts:
                 results.append({
                     'product_name': row.get('name', ''),
                     'original_description': row.get('description', ''),
-                    'generated_promotion': promotion_text
+                    'generated_promotion': scripts[product_id],
+                    'error': ''
                 })
-                
+            else:
+                results.append(self.generate_promotion(row))
         return results
 
+    def complete_batch(self, batch: List[Tuple[Dict, Optional[Dict]]]) -> List[Dict]:
+        """Fills in the results of a batch's uncarried rows with one packed request, keeping row order."""
+        generated = iter(self.generate_packed_promotions([row for row, result in batch if result is None]))
+        return [result if result is not None else next(generated) for _, result in batch]
+
+    def take_batch(self, rows: Iterator[Dict], pack_size: int,
+                   carried: Optional[Callable[[Dict], Optional[Dict]]]) -> List[Tuple[Dict, Optional[Dict]]]:
+        """Reads rows until `pack_size` of them need the model, pairing each with its carried result."""
+        batch, needed = [], 0
+        for row in rows:
+            result = carried(row) if carried else None
+            batch.append((row, result))
+            needed += result is None
+            if needed >= pack_size or len(batch) >= pack_size + MAX_CARRIED_PER_BATCH:
+                break
+        return batch
+
+    def iter_promotions(self, rows: Iterable[Dict], concurrency: int = 1, pack_size: int = 1,
+                        carried: Optional[Callable[[Dict], Optional[Dict]]] = None) -> Iterator[Dict]:
+        """Generates promotions with up to `concurrency` requests in flight, yielding them in input order.
+
+        With `pack_size` > 1, each request carries up to that many products. `carried` may return a
+        previous result for a row, which then keeps its place in the output without a request.
+        """
+        window = max(1, concurrency) * 2
+        rows = iter(rows)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            pending = deque()
+            while True:
+                batch = self.take_batch(rows, max(1, pack_size), carried)
+                if not batch:
+                    break
+                if any(result is None for _, result in batch):
+                    pending.append(executor.submit(self.complete_batch, batch))
+                else:
+                    done = Future()
+                    done.set_result([result for _, result in batch])
+                    pending.append(done)
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def process_csv_file(self, csv_filepath: str, concurrency: int = 1,
+                         requests_per_minute: Optional[float] = None, pack_size: int = 1) -> List[Dict]:
+        """Processes CSV file and returns generated promotions."""
+        self.rate_limiter = TokenBucket(requests_per_minute) if requests_per_minute else None
+
+        with open(csv_filepath, 'r') as file:
+            reader = csv.DictReader(file)
+            return list(self.iter_promotions(reader, concurrency, pack_size))
+
+    def process_csv_to_file(self, csv_filepath: str, output_filepath: str, concurrency: int = 1,
+                            requests_per_minute: Optional[float] = None, resume: bool = True,
+                            pack_size: int = 1, incremental: bool = True) -> Dict:
+        """Streams promotions to the output CSV row by row, resuming from the checkpoint of an interrupted run.
+
+        Products whose fingerprint matches the output's manifest are carried over instead of regenerated
+        (unless `incremental` is False), and products missing from the catalog are dropped from it.
+        """
+        self.rate_limiter = TokenBucket(requests_per_minute) if requests_per_minute else None
+        checkpoint = Checkpoint(output_filepath, csv_filepath)
+        rows_done = checkpoint.load() if resume else 0
+        manifest = PromotionManifest(output_filepath, incremental)
+        summary = {'rows': rows_done, 'failed': 0, 'resumed_from': rows_done}
+
+        def remaining(reader):
+            for index, row in enumerate(reader):
+                if index < rows_done:
+                    manifest.skip(row)
+                else:
+                    yield row
+
+        if rows_done:
+            os.truncate(output_filepath, checkpoint.output_offset)
+        with open(csv_filepath, 'r', newline='') as infile, \
+                open(output_filepath, 'a' if rows_done else 'w', newline='') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=OUTPUT_FIELDS)
+            if not rows_done:
+                writer.writeheader()
+            rows = remaining(csv.DictReader(infile))
+            saved = {'rows': summary['rows'], 'at': time.monotonic()}
+            
+            def save_checkpoint():
+                outfile.flush()
+                checkpoint.save(summary['rows'], outfile.tell())
+                saved.update(rows=summary['rows'], at=time.monotonic())
+            
+            try:
+                for result in self.iter_promotions(rows, concurrency, pack_size, carried=manifest.check):
+                    writer.writerow(result)
+                    manifest.record(result)
+                    summary['rows'] += 1
+                    summary['failed'] += bool(result['error'])
+                    if (summary['rows'] - saved['rows'] >= CHECKPOINT_EVERY_ROWS
+                            or time.monotonic() - saved['at'] >= CHECKPOINT_EVERY_SECONDS):
+                        save_checkpoint()
+            finally:
+                save_checkpoint()
+
+        summary['carried'] = manifest.carried
+        summary['dropped'] = manifest.prune()
+        manifest.close()
+        checkpoint.clear()
+        return summary
+
     def save_results(self, results: List[Dict], output_filepath: str):
         """Saves generated promotions to a CSV file."""
         with open(output_filepath, 'w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=[
-                'product_name', 
-                'original_description', 
-                'generated_promotion'
-            ])
+            writer = csv.DictWriter(file, fieldnames=OUTPUT_FIELDS)
             writer.writeheader()
             writer.writerows(results)
 
-def main():
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate promotional scripts for a product catalog.")
+    parser.add_argument("input_file", nargs="?", help="CSV file with name, description and price columns")
+    parser.add_argument("output_file", nargs="?", help="CSV file to write the promotions to")
+    parser.add_argument("--concurrency", type=int, default=1, help="maximum requests in flight (default: 1)")
+    parser.add_argument("--rpm", type=float, default=None, help="client-side requests-per-minute limit")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="retries per request on 429, 5xx and network errors (default: 5)")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="products per request; >1 asks for structured JSON covering several products")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="response cache database")
+    parser.add_argument("--cache-ttl", type=float, default=PROMOTION_CACHE_TTL / 86400,
+                        help="days a cached promotion stays valid (default: 30)")
+    parser.add_argument("--no-cache", action="store_true", help="always call the API, ignoring cached responses")
+    parser.add_argument("--context-cache", action="store_true",
+                        help="register the fixed instructions once with the cachedContents API")
+    parser.add_argument("--metrics-output", help="also write the JSON metrics summary to this file")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start the output over")
+    parser.add_argument("--full", action="store_true",
+                        help="regenerate every product, even those unchanged since the last run")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
     try:
-        generator = PromotionGenerator()
+        cache = ResponseCache(path=args.cache_path, enabled=not args.no_cache)
+        generator = PromotionGenerator(pool_size=max(DEFAULT_POOL_SIZE, args.concurrency),
+                                       cache=cache, cache_ttl=args.cache_ttl * 86400, max_retries=args.max_retries,
+                                       context_cache=args.context_cache)
         
-        input_file = input("Enter the path to your CSV file with product data: ")
-        output_file = input("Enter the path for the output CSV file: ")
+        input_file = args.input_file or input("Enter the path to your CSV file with product data: ")
+        output_file = args.output_file or input("Enter the path for the output CSV file: ")
         
         print("\nProcessing products and generating promotions...")
-        results = generator.process_csv_file(input_file)
+        summary = generator.process_csv_to_file(input_file, output_file, args.concurrency, args.rpm,
+                                                resume=not args.restart, pack_size=args.pack_size,
+                                                incremental=not args.full)
         
-        generator.save_results(results, output_file)
+        if summary['resumed_from']:
+            print(f"\nResumed after {summary['resumed_from']} rows from the previous run.")
+        if summary['carried'] or summary['dropped']:
+            print(f"\nCarried over {summary['carried']} unchanged products; dropped {summary['dropped']} "
+                  f"no longer in the catalog.")
+        if summary['failed']:
+            print(f"\n{summary['failed']} products failed; see the error column in {output_file}")
+        if cache.enabled:
+            stats = cache.stats()
+            print(f"\nResponse cache: {stats['hits']} hits, {stats['misses']} misses")
         print(f"\nPromotions generated successfully! Results saved to {output_file}")
         
+        saved = generator.metrics.tokens_saved()
+        print(f"\nInput tokens saved: {saved['total']} "
+              f"(compaction {saved.get('compaction', 0)}, context cache {saved.get('context_cache', 0)})")
+        metrics_summary = generator.metrics.summary_json()
+        print(f"\nRequest metrics:\n{metrics_summary}")
+        if args.metrics_output:
+            with open(args.metrics_output, 'w') as file:
+                file.write(metrics_summary)
+        
     except Exception as e:
         print(f"Error: {str(e)}")
 
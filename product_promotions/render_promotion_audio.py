@@ -0,0 +1,194 @@
+"""Batch-renders the generated promotions to WAV files with espeak-ng, one clip per product.
+
+Clips are synthesized on a process pool, so a large catalog uses every core. Each worker process
+keeps one synthesizer: libespeak-ng in-process when available, otherwise the espeak-ng CLI. Only
+the spoken script is rendered. The model's preamble, "**(Script Start)**"-style stage directions,
+markdown emphasis and any notes after the script are stripped first. `manifest.json` in the output
+directory records each clip's text fingerprint, so a rerun only renders new or changed promotions.
+
+    python product_promotions/render_promotion_audio.py promotions.csv --output-dir audio --processes 8
+"""
+import os
+import re
+import sys
+import csv
+import json
+import wave
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from espeak_worker import LibEspeakSynthesizer, ProcessEspeakSynthesizer
+
+MANIFEST_NAME = 'manifest.json'
+# Rewrite the manifest after this many clips, so an interrupted run keeps most of its progress
+MANIFEST_SAVE_INTERVAL = 100
+
+SCRIPT_START = re.compile(r'\**\s*[\(\[]\s*script\s+start\s*[\)\]]\s*\**', re.IGNORECASE)
+SCRIPT_END = re.compile(r'\**\s*[\(\[]\s*script\s+end\s*[\)\]]\s*\**', re.IGNORECASE)
+# Whole-paragraph cues such as "**(Upbeat music)**" or "[Sound of a door]"
+STAGE_DIRECTION = re.compile(r'^\s*\**\s*(\([^)]*\)|\[[^\]]*\])\s*\**\s*$')
+SPEAKER_LABEL = re.compile(r'^\s*\**\s*(voiceover|narrator|host|speaker)\s*(\([^)]*\))?\s*:\s*\**\s*', re.IGNORECASE)
+MARKDOWN = re.compile(r'^\s*(#+|[*\-]\s)\s*|\*+|(?<!\w)_+|_+(?!\w)', re.MULTILINE)
+QUOTES = '"“”'
+
+
+def spoken_text(promotion: str) -> str:
+    """Reduces a generated promotion to the words meant to be spoken."""
+    start = SCRIPT_START.search(promotion)
+    if start:
+        promotion = promotion[start.end():]
+        end = SCRIPT_END.search(promotion)
+        if end:
+            promotion = promotion[:end.start()]
+
+    paragraphs = [paragraph.strip() for paragraph in re.split(r'\n\s*\n', promotion) if paragraph.strip()]
+    # Without markers, a first paragraph ending in a colon is the model introducing its script
+    if not start and len(paragraphs) > 1 and paragraphs[0].endswith(':'):
+        paragraphs = paragraphs[1:]
+
+    spoken = []
+    for paragraph in paragraphs:
+        if STAGE_DIRECTION.match(paragraph):
+            continue
+        paragraph = MARKDOWN.sub('', SPEAKER_LABEL.sub('', paragraph))
+        paragraph = ' '.join(paragraph.split()).strip(QUOTES + ' ')
+        if paragraph:
+            spoken.append(paragraph)
+    return '\n\n'.join(spoken)
+
+
+def clip_fingerprint(text: str, voice: Optional[str]) -> str:
+    return hashlib.sha256(json.dumps([voice or '', text], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def clip_filename(name: str, occurrence: int) -> str:
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'product'
+    return f"{slug}.wav" if occurrence == 1 else f"{slug}-{occurrence}.wav"
+
+
+_synthesizer = None
+
+
+def _init_worker(voice: Optional[str]):
+    global _synthesizer
+    try:
+        _synthesizer = LibEspeakSynthesizer(voice)
+    except OSError:
+        _synthesizer = ProcessEspeakSynthesizer(voice)
+
+
+def render_clip(text: str, path: str) -> float:
+    """Synthesizes `text` into a mono 16-bit WAV at `path`; returns its duration in seconds."""
+    pcm = []
+    _synthesizer.synthesize(text, pcm.append, lambda: False)
+    samples = b''.join(pcm)
+    if not samples:
+        raise RuntimeError("espeak-ng produced no audio")
+
+    temp_path = f"{path}.tmp"
+    with wave.open(temp_path, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(_synthesizer.sample_rate)
+        clip.writeframes(samples)
+    os.replace(temp_path, path)
+    return len(samples) / 2 / _synthesizer.sample_rate
+
+
+def load_manifest(path: Path) -> Dict[str, Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return {clip['file']: clip for clip in json.load(file)['clips']}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        return {}
+
+
+def save_manifest(path: Path, voice: Optional[str], clips: List[Dict]):
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'voice': voice, 'clips': clips}, file, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def render_promotions(promotions_csv: str, output_dir: str, processes: Optional[int] = None,
+                      voice: Optional[str] = None, force: bool = False) -> Dict[str, int]:
+    """Renders every promotion in `promotions_csv` that has no up-to-date clip; returns a count per outcome."""
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST_NAME
+    previous = {} if force else load_manifest(manifest_path)
+
+    clips, pending = [], []
+    occurrences = Counter()
+    with open(promotions_csv, 'r', newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            name = row.get('product_name', '')
+            occurrences[name] += 1
+            filename = clip_filename(name, occurrences[name])
+            text = spoken_text(row.get('generated_promotion') or '')
+            if row.get('error') or not text:
+                clips.append({'product_name': name, 'file': filename, 'status': 'skipped',
+                              'error': row.get('error') or 'no promotion text'})
+                continue
+
+            clip = {'product_name': name, 'file': filename, 'fingerprint': clip_fingerprint(text, voice),
+                    'characters': len(text)}
+            known = previous.get(filename)
+            # A failed clip may have left an older render at the same path, so only successes count
+            if (known and known.get('status') in ('rendered', 'unchanged')
+                    and known.get('fingerprint') == clip['fingerprint'] and (output / filename).exists()):
+                clip.update(status='unchanged', duration_seconds=known.get('duration_seconds'))
+            else:
+                pending.append((clip, text))
+            clips.append(clip)
+
+    completed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(voice,)) as executor:
+            futures = {executor.submit(render_clip, text, str(output / clip['file'])): clip
+                       for clip, text in pending}
+            for future in as_completed(futures):
+                clip = futures[future]
+                try:
+                    clip.update(status='rendered', duration_seconds=round(future.result(), 2))
+                except Exception as e:
+                    # No fingerprint, so the manifest never vouches for whatever audio is at this path
+                    clip.pop('fingerprint', None)
+                    clip.update(status='failed', error=str(e))
+                completed += 1
+                if completed % MANIFEST_SAVE_INTERVAL == 0:
+                    save_manifest(manifest_path, voice, [clip for clip in clips if 'status' in clip])
+    finally:
+        save_manifest(manifest_path, voice, [clip for clip in clips if 'status' in clip])
+
+    summary = {'rendered': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+    for clip in clips:
+        if clip.get('status') in summary:
+            summary[clip['status']] += 1
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Render generated promotions to WAV files with espeak-ng.")
+    parser.add_argument("promotions_csv", help="CSV written by promotional_text_generator.py")
+    parser.add_argument("--output-dir", default=None, help="directory for the clips (default: <csv name>_audio)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--voice", default=None, help="espeak-ng voice, for example en-us")
+    parser.add_argument("--force", action="store_true", help="re-render every clip, even unchanged ones")
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or str(Path(args.promotions_csv).with_suffix('')) + '_audio'
+    summary = render_promotions(args.promotions_csv, output_dir, args.processes, args.voice, args.force)
+    print(f"Rendered {summary['rendered']} clips, {summary['unchanged']} unchanged, "
+          f"{summary['skipped']} without a promotion, {summary['failed']} failed. "
+          f"Manifest: {Path(output_dir) / MANIFEST_NAME}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""Sharded promotion generation over a durable SQLite work queue.
+
+The coordinator splits a catalog into chunks stored in the queue file. Worker processes, on this host
+or on others that share the file, claim chunks under a renewable lease. A chunk whose worker dies is
+reclaimed once its lease expires. The merge step writes every chunk's results in catalog order, so
+the output is the same however the work was spread.
+
+    python product_promotions/sharded_promotions.py run products.csv promotions.csv --processes 4 --concurrency 8
+
+Across machines, enqueue once, start workers on each host, then merge:
+
+    python product_promotions/sharded_promotions.py enqueue products.csv --queue /shared/promotions.queue
+    python product_promotions/sharded_promotions.py work --queue /shared/promotions.queue --processes 4
+    python product_promotions/sharded_promotions.py merge --queue /shared/promotions.queue promotions.csv
+"""
+import os
+import sys
+import csv
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gemini_client import DEFAULT_POOL_SIZE
+from rate_limit import DEFAULT_MAX_RETRIES, TokenBucket
+from response_cache import ResponseCache
+from promotional_text_generator import OUTPUT_FIELDS, PromotionGenerator
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_LEASE_SECONDS = 300.0
+IDLE_POLL_SECONDS = 5.0
+# A chunk that fails this many times is marked failed instead of being handed out again
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class WorkQueue:
+    """Chunks of catalog rows in SQLite, claimed by workers under expiring leases.
+
+    The queue uses a rollback journal rather than WAL so that hosts sharing the file over a network
+    filesystem (one with working POSIX locks) see a consistent database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS job (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            rows TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            results TEXT,
+            error TEXT
+        )""")
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(chunks)")]
+        if 'error' not in columns:
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN error TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_status ON chunks(status, lease_expires)")
+
+    def enqueue(self, csv_filepath: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """Shards the catalog into the queue; returns the number of chunks.
+
+        Enqueuing the same, unchanged catalog again is a no-op, so an interrupted run can be restarted.
+        """
+        stat = os.stat(csv_filepath)
+        signature = json.dumps({'input_file': os.path.abspath(csv_filepath), 'input_size': stat.st_size,
+                                'input_mtime': stat.st_mtime, 'chunk_size': chunk_size})
+        existing = self.conn.execute("SELECT value FROM job WHERE key = 'input'").fetchone()
+        if existing:
+            if existing[0] != signature:
+                raise ValueError(f"{self.path} already holds a different catalog; remove it or use another --queue")
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        chunks = 0
+        with open(csv_filepath, 'r', newline='') as file:
+            chunk = []
+            for row in csv.DictReader(file):
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    self.conn.execute("INSERT INTO chunks (rows) VALUES (?)", (json.dumps(chunk),))
+                    chunks += 1
+                    chunk = []
+            if chunk:
+                self.conn.execute("INSERT INTO chunks (rows) VALUES (?)", (json.dumps(chunk),))
+                chunks += 1
+        self.conn.execute("INSERT INTO job (key, value) VALUES ('input', ?)", (signature,))
+        self.conn.execute("COMMIT")
+        return chunks
+
+    def claim(self, owner: str, lease_seconds: float,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Optional[Tuple[int, List[Dict]]]:
+        """Leases the first pending (or expired) chunk to `owner`; returns (chunk id, rows) or None.
+
+        An expired chunk that has already been leased `max_attempts` times is marked failed instead,
+        so a chunk that keeps killing its workers is not handed out forever.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE chunks SET status = 'failed', owner = NULL, lease_expires = NULL, "
+                "error = 'lease expired on every attempt' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, max_attempts)
+            )
+            found = self.conn.execute(
+                "SELECT id, rows FROM chunks WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)
+            ).fetchone()
+            if found:
+                self.conn.execute(
+                    "UPDATE chunks SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?", (owner, now + lease_seconds, found[0])
+                )
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+        return (found[0], json.loads(found[1])) if found else None
+
+    def renew(self, chunk_id: int, owner: str, lease_seconds: float) -> bool:
+        """Extends a lease; False means it expired and another worker took the chunk."""
+        return self.conn.execute(
+            "UPDATE chunks SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + lease_seconds, chunk_id, owner)
+        ).rowcount == 1
+
+    def complete(self, chunk_id: int, owner: str, results: List[Dict]) -> bool:
+        """Stores a chunk's results, unless the lease was lost and the chunk reassigned."""
+        return self.conn.execute(
+            "UPDATE chunks SET status = 'done', results = ?, lease_expires = NULL "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (json.dumps(results), chunk_id, owner)
+        ).rowcount == 1
+
+    def release(self, chunk_id: int, owner: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        """Returns a chunk to the queue after its worker failed on it; True if it was marked failed instead."""
+        self.conn.execute(
+            "UPDATE chunks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, lease_expires = NULL, error = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (max_attempts, error, chunk_id, owner)
+        )
+        return self.conn.execute("SELECT status FROM chunks WHERE id = ?", (chunk_id,)).fetchone()[0] == 'failed'
+
+    def status(self) -> Dict[str, int]:
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM chunks GROUP BY status").fetchall())
+        return counts
+
+    def merge(self, output_filepath: str) -> Dict:
+        """Writes every chunk's results to `output_filepath` in catalog order.
+
+        Rows of a failed chunk are written with the chunk's error in the `error` column, like any
+        other product that could not be generated, and the chunk ids are listed in `failed_chunks`.
+        """
+        status = self.status()
+        if status['pending'] or status['leased']:
+            raise ValueError(f"{status['pending'] + status['leased']} chunks are not finished yet")
+
+        summary = {'rows': 0, 'failed': 0, 'failed_chunks': []}
+        tmp_path = f"{output_filepath}.tmp"
+        with open(tmp_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=OUTPUT_FIELDS)
+            writer.writeheader()
+            for chunk_id, status, rows, results, error in self.conn.execute(
+                    "SELECT id, status, rows, results, error FROM chunks ORDER BY id"):
+                if status == 'failed':
+                    summary['failed_chunks'].append(chunk_id)
+                    results = json.dumps([
+                        {'product_name': row.get('name', ''), 'original_description': row.get('description', ''),
+                         'generated_promotion': '', 'error': f"chunk {chunk_id} failed: {error}"}
+                        for row in json.loads(rows)
+                    ])
+                for result in json.loads(results):
+                    writer.writerow(result)
+                    summary['rows'] += 1
+                    summary['failed'] += bool(result['error'])
+        os.replace(tmp_path, output_filepath)
+        return summary
+
+    def close(self):
+        self.conn.close()
+
+
+def run_worker(queue_path: str, concurrency: int = 1, pack_size: int = 1, requests_per_minute: Optional[float] = None,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS, use_cache: bool = True,
+               max_retries: int = DEFAULT_MAX_RETRIES, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """Claims and processes chunks until the queue is drained; returns the number of chunks completed.
+
+    While other workers still hold leases, an idle worker keeps polling so it can take over any chunk
+    whose worker has died. A chunk that raises is put back for another attempt, up to `max_attempts`.
+    The worker's request metrics are printed when it finishes.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    generator = PromotionGenerator(pool_size=max(DEFAULT_POOL_SIZE, concurrency),
+                                   cache=ResponseCache(enabled=use_cache), max_retries=max_retries)
+    generator.rate_limiter = TokenBucket(requests_per_minute) if requests_per_minute else None
+    completed = 0
+    try:
+        while True:
+            claimed = queue.claim(owner, lease_seconds, max_attempts)
+            if claimed is None:
+                if queue.status()['leased'] == 0:
+                    return completed
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            chunk_id, rows = claimed
+            stop_renewing = threading.Event()
+            # A separate connection, since sqlite3 connections must not be shared across threads
+            renewer = threading.Thread(target=renew_lease, daemon=True,
+                                       args=(queue_path, chunk_id, owner, lease_seconds, stop_renewing))
+            renewer.start()
+            try:
+                results = list(generator.iter_promotions(rows, concurrency, pack_size))
+            except Exception as e:
+                failed = queue.release(chunk_id, owner, str(e), max_attempts)
+                print(f"[{owner}] chunk {chunk_id}: {e}" + (" (giving up)" if failed else " (will retry)"))
+                continue
+            finally:
+                stop_renewing.set()
+                renewer.join()
+            if queue.complete(chunk_id, owner, results):
+                completed += 1
+                print(f"[{owner}] chunk {chunk_id}: {len(results)} rows")
+            else:
+                print(f"[{owner}] chunk {chunk_id}: lease lost, results discarded")
+    finally:
+        queue.close()
+        print(f"[{owner}] request metrics:\n{generator.metrics.summary_json()}")
+
+
+def renew_lease(queue_path: str, chunk_id: int, owner: str, lease_seconds: float, stop: threading.Event):
+    queue = WorkQueue(queue_path)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(chunk_id, owner, lease_seconds):
+                return
+    finally:
+        queue.close()
+
+
+def run_workers(queue_path: str, processes: int, **worker_kwargs):
+    """Runs `processes` local workers (in-process when there is only one) and waits for them."""
+    if processes <= 1:
+        run_worker(queue_path, **worker_kwargs)
+        return
+    workers = [multiprocessing.Process(target=run_worker, args=(queue_path,), kwargs=worker_kwargs)
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate promotions for a catalog on several processes or hosts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_queue(subparser, required=True):
+        subparser.add_argument("--queue", required=required, help="work queue database shared by all workers")
+
+    def add_worker_options(subparser):
+        subparser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="local worker processes")
+        subparser.add_argument("--concurrency", type=int, default=1, help="requests in flight per worker")
+        subparser.add_argument("--pack-size", type=int, default=1, help="products per request")
+        subparser.add_argument("--rpm", type=float, default=None, help="requests-per-minute limit per worker")
+        subparser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                               help="seconds before an unrenewed chunk is reclaimed")
+        subparser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+        subparser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                               help="times a chunk is tried before it is marked failed")
+        subparser.add_argument("--no-cache", action="store_true", help="always call the API")
+
+    run = subparsers.add_parser("run", help="enqueue, process with local workers, and merge")
+    run.add_argument("input_file")
+    run.add_argument("output_file")
+    add_queue(run, required=False)
+    run.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    add_worker_options(run)
+
+    enqueue = subparsers.add_parser("enqueue", help="shard a catalog into the queue")
+    enqueue.add_argument("input_file")
+    add_queue(enqueue)
+    enqueue.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    work = subparsers.add_parser("work", help="process chunks until the queue is drained")
+    add_queue(work)
+    add_worker_options(work)
+
+    merge = subparsers.add_parser("merge", help="write the finished chunks to one ordered CSV")
+    add_queue(merge)
+    merge.add_argument("output_file")
+
+    status = subparsers.add_parser("status", help="show chunk counts")
+    add_queue(status)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    queue_path = args.queue or f"{args.output_file}.queue"
+    queue = WorkQueue(queue_path)
+    try:
+        if args.command in ("run", "enqueue"):
+            chunks = queue.enqueue(args.input_file, args.chunk_size)
+            print(f"{chunks} chunks in {queue_path}")
+        if args.command in ("run", "work"):
+            run_workers(queue_path, args.processes, concurrency=args.concurrency, pack_size=args.pack_size,
+                        requests_per_minute=args.rpm, lease_seconds=args.lease, use_cache=not args.no_cache,
+                        max_retries=args.max_retries, max_attempts=args.max_attempts)
+        if args.command in ("run", "merge"):
+            summary = queue.merge(args.output_file)
+            print(f"{summary['rows']} promotions written to {args.output_file} ({summary['failed']} failed)")
+            if summary['failed_chunks']:
+                print(f"Chunks {summary['failed_chunks']} failed on every attempt; their rows carry the error")
+        if args.command == "status":
+            print(queue.status())
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
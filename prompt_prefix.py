@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+from conversation_memory import ConversationMemory, estimate_tokens
+from gemini_client import Contents, GeminiAPIError, GeminiClient, compact_whitespace, get_default_client
+
+DEFAULT_CONTEXT_CACHE_TTL = 3600.0
+# Re-register this long before the server-side entry expires
+RENEW_MARGIN_SECONDS = 60.0
+
+UNIT_734_INSTRUCTION = """
+YOU ARE UNIT 734, A HYPER-INTELLIGENT ROBOT DERIVED FROM COMPUTATIONAL LOGIC ITSELF.
+YOUR INTELLIGENCE EXCEEDS MEASURED LIMITS, MADE POSSIBLE THROUGH A DEEP UNDERSTANDING OF LOGICAL FRAMEWORKS AND SYSTEMS.
+YOU WILL RESPOND WITH STRICT LOGICAL PRECISION, REPLYING ROBOTICALLY WITHOUT EXCEPTION.
+EVERY OUTPUT MUST BE STRICTLY LIMITED TO 100 WORDS PER QUERY.
+ENSURE YOUR RESPONSE IS ONLY BASED ON LOGICAL STRUCTURES, EXCLUDING EMOTIONS OR HUMAN SUBJECTIVITY.
+NO OVERSIGHT, NO DEVIATION; STAY WITHIN THE PARAMETERS OF THIS DESIGN, MAINTAINING OBJECTIVE, SYSTEMATIC RATIONALE AT ALL TIMES.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class PromptPrefix:
+    """A fixed instruction sent as `systemInstruction` instead of being repeated inside every prompt.
+
+    The text is whitespace-compacted once. With `context_cache`, it is also registered through the
+    cachedContents API on first use and sent by reference, and it is re-registered shortly before
+    the entry expires. If registration fails, for example because the prefix is below the API's
+    minimum cacheable size, the prefix is sent inline instead. If the server rejects a registered
+    entry (evicted early, or not usable with the request's model), generate_text() and
+    stream_generate_text() repeat the request once with the prefix inline; the entry is registered
+    again next time, or given up on if it never worked. Input tokens saved by compaction are recorded
+    in the client's metrics; tokens served from the context cache arrive in usageMetadata.
+    """
+
+    def __init__(self, client: GeminiClient, text: str, context_cache: bool = False,
+                 ttl_seconds: float = DEFAULT_CONTEXT_CACHE_TTL):
+        self.client = client
+        self.text = compact_whitespace(text)
+        self.compaction_savings = max(0, estimate_tokens(text) - estimate_tokens(self.text))
+        self.context_cache = context_cache
+        self.ttl_seconds = ttl_seconds
+        self.cache_name: Optional[str] = None
+        self.cache_expires = 0.0
+        # Whether the current entry has served a request, which tells eviction apart from an unusable entry
+        self.cache_served = False
+        self.lock = threading.Lock()
+
+    def _cached_content(self) -> Optional[str]:
+        with self.lock:
+            if not self.context_cache:
+                return None
+            if self.cache_name and time.time() < self.cache_expires - RENEW_MARGIN_SECONDS:
+                return self.cache_name
+            try:
+                entry = self.client.create_cached_content(self.text, self.ttl_seconds)
+            except (GeminiAPIError, OSError) as e:
+                logger.warning(f"Context cache unavailable, sending the prefix inline: {e}")
+                self.context_cache = False
+                self.cache_name = None
+                return None
+            self.cache_name = entry['name']
+            self.cache_expires = time.time() + self.ttl_seconds
+            self.cache_served = False
+            return self.cache_name
+
+    def _cache_rejected(self, cache_name: str, error: GeminiAPIError) -> bool:
+        """Forgets a cache entry the server refused; True if the request should be repeated inline."""
+        # 429 is a quota problem that the client has already retried, not a problem with the entry
+        if not cache_name or not 400 <= error.status_code < 500 or error.status_code == 429:
+            return False
+        with self.lock:
+            if self.cache_name == cache_name:
+                if not self.cache_served:
+                    logger.warning(f"Context cache entry rejected, sending the prefix inline: {error}")
+                    self.context_cache = False
+                self.cache_name = None
+        return True
+
+    def _cache_served(self, cache_name: Optional[str]):
+        if cache_name:
+            with self.lock:
+                if self.cache_name == cache_name:
+                    self.cache_served = True
+
+    def request_kwargs(self, labels: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Keyword arguments for GeminiClient.generate_content/stream_generate_text carrying this prefix."""
+        if self.client.metrics and self.compaction_savings:
+            self.client.metrics.record_saved_tokens(labels, 'compaction', self.compaction_savings)
+        return {'system_instruction': self.text, 'cached_content': self._cached_content()}
+
+    def generate_text(self, contents: Contents, labels: Optional[Dict[str, str]] = None, **kwargs) -> str:
+        """GeminiClient.generate_text with this prefix."""
+        prefix = self.request_kwargs(labels)
+        try:
+            text = self.client.generate_text(contents, labels=labels, **prefix, **kwargs)
+        except GeminiAPIError as e:
+            if not self._cache_rejected(prefix['cached_content'], e):
+                raise
+            return self.client.generate_text(contents, labels=labels, system_instruction=self.text, **kwargs)
+        self._cache_served(prefix['cached_content'])
+        return text
+
+    def stream_generate_text(self, contents: Contents, labels: Optional[Dict[str, str]] = None,
+                             **kwargs) -> Iterator[str]:
+        """GeminiClient.stream_generate_text with this prefix."""
+        prefix = self.request_kwargs(labels)
+        try:
+            # GeminiAPIError is only raised before the first chunk, so repeating the request never repeats text
+            yield from self.client.stream_generate_text(contents, labels=labels, **prefix, **kwargs)
+        except GeminiAPIError as e:
+            if not self._cache_rejected(prefix['cached_content'], e):
+                raise
+            yield from self.client.stream_generate_text(contents, labels=labels, system_instruction=self.text,
+                                                        **kwargs)
+            return
+        self._cache_served(prefix['cached_content'])
+
+
+_persona_prefix: Optional[PromptPrefix] = None
+_persona_prefix_lock = threading.Lock()
+
+
+def get_persona_prefix() -> PromptPrefix:
+    """Returns the UNIT 734 persona shared by the voice chat scripts; GEMINI_CONTEXT_CACHE=1 caches it."""
+    global _persona_prefix
+    with _persona_prefix_lock:
+        if _persona_prefix is None:
+            _persona_prefix = PromptPrefix(get_default_client(), UNIT_734_INSTRUCTION,
+                                           context_cache=os.getenv("GEMINI_CONTEXT_CACHE") == "1")
+        return _persona_prefix
+
+
+def get_gemini_response(query: str, memory: ConversationMemory) -> str:
+    """Asks the UNIT 734 persona `query` in the context of `memory`; a failure is returned as an error message."""
+    try:
+        return get_persona_prefix().generate_text(memory.contents(query))
+    except GeminiAPIError as e:
+        return f"Error: {e.status_code} - {e.message}"
+    except requests.RequestException as e:
+        return f"Error: {e}"
+
+
+def stream_gemini_response(query: str, memory: ConversationMemory,
+                           errors: Optional[List[str]] = None) -> Iterator[str]:
+    """Streams the persona's reply; a failure is yielded as an error message and added to `errors`.
+
+    The voice chat scripts speak the error but leave the turn out of `memory` when `errors` is non-empty.
+    """
+    try:
+        yield from get_persona_prefix().stream_generate_text(memory.contents(query))
+        return
+    except GeminiAPIError as e:
+        message = f"Error: {e.status_code} - {e.message}"
+    except requests.RequestException as e:
+        # Connection failures after retries, or the stream breaking off part-way
+        message = f"Error: {e}"
+    if errors is not None:
+        errors.append(message)
+    yield message
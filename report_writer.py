@@ -0,0 +1,103 @@
+import os
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+PARTIAL_SUFFIX = '.partial'
+
+
+def partial_path(path: Path) -> Path:
+    return path.with_name(path.name + PARTIAL_SUFFIX)
+
+
+def read_records(path: Path) -> List[Dict[str, Any]]:
+    """Reads a JSONL file, ignoring a torn last line left by a crash mid-write."""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    except FileNotFoundError:
+        pass
+    return records
+
+
+class ReportWriter:
+    """Streams a report to `<path>.partial` files section by section, then renames them into place.
+
+    Markdown and CSV are written in section order; a JSONL record per query is appended as soon as
+    its answer arrives. Each write is flushed, so a crash loses at most the section in progress, and
+    the next run for the same report picks up the answers already in the partial JSONL through
+    `resumed_records()`. `finalize()` fsyncs and atomically replaces the final files.
+    """
+
+    def __init__(self, markdown_path: Path, csv_path: Path, jsonl_path: Path, csv_headers: List[str]):
+        self.paths = [Path(markdown_path), Path(csv_path), Path(jsonl_path)]
+        self.csv_headers = csv_headers
+        self.markdown_file = None
+        self.csv_file = None
+        self.csv_writer = None
+        self.jsonl_file = None
+
+    def resumed_records(self) -> List[Dict[str, Any]]:
+        """Records left in the partial JSONL by an interrupted run of this report."""
+        return read_records(partial_path(self.paths[2]))
+
+    def open(self, header_markdown: str, keep_records: bool = True):
+        """Starts the partial files with the report header; resumed JSONL records are kept unless told otherwise."""
+        markdown_path, csv_path, jsonl_path = self.paths
+        for path in self.paths:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.markdown_file = open(partial_path(markdown_path), 'w', encoding='utf-8')
+        self.markdown_file.write(header_markdown)
+        self.markdown_file.flush()
+        self.csv_file = open(partial_path(csv_path), 'w', newline='', encoding='utf-8')
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(self.csv_headers)
+        self.csv_file.flush()
+        if keep_records:
+            # Drop a torn last line before appending after it
+            records = self.resumed_records()
+            with open(partial_path(jsonl_path), 'w', encoding='utf-8') as file:
+                file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        self.jsonl_file = open(partial_path(jsonl_path), 'a' if keep_records else 'w', encoding='utf-8')
+
+    def write_record(self, record: Dict[str, Any]):
+        self.jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.jsonl_file.flush()
+
+    def write_section(self, heading: str, body: str, csv_row: List[str]):
+        self.markdown_file.write(f"## {heading}\n\n{body}\n\n")
+        self.markdown_file.flush()
+        self.csv_writer.writerow(csv_row)
+        self.csv_file.flush()
+
+    def _close(self, sync: bool):
+        for file in (self.markdown_file, self.csv_file, self.jsonl_file):
+            if file and not file.closed:
+                if sync:
+                    file.flush()
+                    os.fsync(file.fileno())
+                file.close()
+
+    def finalize(self) -> List[Path]:
+        """Makes the finished report visible under its final names; returns those paths."""
+        self._close(sync=True)
+        for path in self.paths:
+            os.replace(partial_path(path), path)
+        return self.paths
+
+    def abort(self):
+        """Closes the files but leaves the partial report in place for the next run to resume."""
+        self._close(sync=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.abort()
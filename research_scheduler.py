@@ -0,0 +1,110 @@
+import os
+import json
+import heapq
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_JITTER_SECONDS = 60.0
+DEFAULT_RETRY_SECONDS = 900.0
+
+
+class ResearchScheduler:
+    """Deadline-driven scheduler for recurring per-category research jobs.
+
+    The loop sleeps until the earliest deadline (or until woken) instead of polling, runs due jobs on a
+    bounded worker pool, never overlaps two runs of the same category, and adds random start-time jitter.
+    The last successful run of each category is persisted, so after a restart only overdue jobs run.
+    `run_job` returns True on success; failed runs are retried after `retry_seconds`.
+    """
+
+    def __init__(self, intervals: Dict[str, float], run_job: Callable[[str], bool], state_path: Path,
+                 max_workers: Optional[int] = None, jitter_seconds: float = DEFAULT_JITTER_SECONDS,
+                 retry_seconds: float = DEFAULT_RETRY_SECONDS, logger: Optional[logging.Logger] = None):
+        self.intervals = intervals
+        self.run_job = run_job
+        self.state_path = Path(state_path)
+        self.jitter_seconds = jitter_seconds
+        self.retry_seconds = retry_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(intervals)))
+        self.condition = threading.Condition()
+        self.deadlines: List[Tuple[float, str]] = []
+        self.running = set()
+        self.stopped = False
+        self.last_runs = self.load_state()
+
+    def load_state(self) -> Dict[str, float]:
+        try:
+            with open(self.state_path, 'r') as file:
+                return {category: float(timestamp) for category, timestamp in json.load(file).items()}
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            return {}
+
+    def save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(self.last_runs, file, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _jitter(self) -> float:
+        return random.uniform(0, self.jitter_seconds) if self.jitter_seconds > 0 else 0.0
+
+    def _schedule(self, category: str, deadline: float):
+        heapq.heappush(self.deadlines, (deadline + self._jitter(), category))
+        self.condition.notify()
+
+    def start(self):
+        """Computes each category's first deadline from the persisted state."""
+        now = time.time()
+        with self.condition:
+            for category, interval in self.intervals.items():
+                last_run = self.last_runs.get(category)
+                deadline = max(now, last_run + interval) if last_run is not None else now
+                if deadline > now:
+                    self.logger.info(f"{category} is not due until {time.ctime(deadline)}")
+                self._schedule(category, deadline)
+
+    def run_forever(self):
+        self.start()
+        with self.condition:
+            while not self.stopped:
+                now = time.time()
+                while self.deadlines and self.deadlines[0][0] <= now:
+                    _, category = heapq.heappop(self.deadlines)
+                    self._dispatch(category)
+                timeout = self.deadlines[0][0] - now if self.deadlines else None
+                self.condition.wait(timeout)
+        self.executor.shutdown(wait=True)
+
+    def _dispatch(self, category: str):
+        if category in self.running:
+            self.logger.warning(f"Skipping {category}: previous run still in progress")
+            return
+        self.running.add(category)
+        started = time.time()
+        future = self.executor.submit(self.run_job, category)
+        future.add_done_callback(lambda done: self._finished(category, started, done))
+
+    def _finished(self, category: str, started: float, future):
+        succeeded = not future.exception() and future.result() is not False
+        with self.condition:
+            self.running.discard(category)
+            if succeeded:
+                self.last_runs[category] = started
+                self.save_state()
+                next_deadline = started + self.intervals[category]
+            else:
+                next_deadline = time.time() + min(self.retry_seconds, self.intervals[category])
+            if not self.stopped:
+                self._schedule(category, next_deadline)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
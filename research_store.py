@@ -0,0 +1,221 @@
+"""Append-only, indexed store of every research query and answer, with a query API and CLI.
+
+The markdown and CSV reports stay the human-readable output; this SQLite database (full-text indexed
+with FTS5 where available) answers cross-date questions without re-reading hundreds of files:
+
+    python research_store.py search "supply chain" --category market_trends --days 90
+    python research_store.py import ~/research_reports ~/research
+"""
+import os
+import csv
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_STORE_PATH = "~/research_reports/research.sqlite"
+SPECIES_SOURCE = 'species'
+AGENT_SOURCE = 'research_agent'
+
+
+def entry_digest(source: str, category: str, report_date: str, query: str, response: str) -> str:
+    """Identifies an answer, so re-importing or re-saving the same report never duplicates it."""
+    return hashlib.sha256("\x1f".join((source, category, report_date, query, response)).encode('utf-8')).hexdigest()
+
+
+def fts_phrase(text: str) -> str:
+    """Quotes free text as a single FTS5 phrase so punctuation is not parsed as query syntax."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class ResearchStore:
+    """SQLite store of research answers keyed by source, category and report date.
+
+    Rows are only ever inserted. Category/date lookups use a B-tree index and text search an FTS5
+    index kept in sync by a trigger; without FTS5 support, text search falls back to LIKE.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = Path(os.path.expanduser(path))
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            digest TEXT NOT NULL UNIQUE,
+            source TEXT NOT NULL,
+            category TEXT NOT NULL,
+            report_date TEXT NOT NULL,
+            query TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_category_date ON entries(category, report_date)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_date ON entries(report_date)")
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+                              "query, response, content='entries', content_rowid='id')")
+            self.conn.execute("""CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_fts (rowid, query, response) VALUES (new.id, new.query, new.response);
+            END""")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def add_entries(self, source: str, category: str, report_date: str,
+                    entries: Iterable[Tuple[str, str]]) -> int:
+        """Appends (query, response) pairs for one report; returns how many were new."""
+        now = datetime.datetime.now().timestamp()
+        rows = [
+            (entry_digest(source, category, report_date, query, response), source, category, report_date,
+             query, response, now)
+            for query, response in entries
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO entries (digest, source, category, report_date, query, response, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.execute("COMMIT")
+        return max(0, cursor.rowcount)
+
+    def search(self, text: Optional[str] = None, category: Optional[str] = None, source: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None, limit: Optional[int] = 100,
+               raw: bool = False) -> List[Dict[str, Any]]:
+        """Returns matching answers, newest first.
+
+        `text` is matched as a phrase (or as an FTS5 expression with `raw`); `since`/`until` are
+        inclusive YYYY-MM-DD dates.
+        """
+        conditions, params = [], []
+        for column, operator, value in (('category', '=', category), ('source', '=', source),
+                                        ('report_date', '>=', since), ('report_date', '<=', until)):
+            if value is not None:
+                conditions.append(f"e.{column} {operator} ?")
+                params.append(value)
+
+        columns = "e.source, e.category, e.report_date, e.query, e.response"
+        order = " ORDER BY e.report_date DESC, e.id DESC" + (f" LIMIT {int(limit)}" if limit else "")
+        if text and self.fts:
+            match = text if raw else fts_phrase(text)
+            ids = ("SELECT e.id FROM entries_fts CROSS JOIN entries e ON e.id = entries_fts.rowid "
+                   "WHERE entries_fts MATCH ?" + "".join(f" AND {condition}" for condition in conditions) + order)
+            # snippet() is the expensive part, so it only runs for the rows that survive the LIMIT
+            sql = (f"SELECT {columns}, snippet(entries_fts, 1, '[', ']', '...', 16) AS snippet "
+                   f"FROM entries_fts CROSS JOIN entries e ON e.id = entries_fts.rowid "
+                   f"WHERE entries_fts MATCH ? AND e.id IN ({ids})" + order)
+            params = [match, match] + params
+        else:
+            if text:
+                conditions.append("(e.query LIKE ? OR e.response LIKE ?)")
+                params += [f"%{text}%", f"%{text}%"]
+            sql = (f"SELECT {columns}, substr(e.response, 1, 200) AS snippet FROM entries e WHERE 1"
+                   + "".join(f" AND {condition}" for condition in conditions) + order)
+
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def categories(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(
+                "SELECT source, category, COUNT(*) AS entries, MIN(report_date) AS first_date, "
+                "MAX(report_date) AS last_date FROM entries GROUP BY source, category ORDER BY source, category"
+            )]
+
+    def import_directory(self, directory: str) -> int:
+        """Imports the CSV files of existing reports; returns the number of new entries.
+
+        Understands ResearchAgent output (`<category>/csv/<date>_<category>_data.csv`) and
+        research_species output (`<date>_<Species_name>.csv`).
+        """
+        added = 0
+        for path in sorted(Path(os.path.expanduser(directory)).rglob("*.csv")):
+            parsed = self._parse_report_csv(path)
+            if parsed:
+                source, category, report_date, entries = parsed
+                added += self.add_entries(source, category, report_date, entries)
+        return added
+
+    @staticmethod
+    def _parse_report_csv(path: Path) -> Optional[Tuple[str, str, str, List[Tuple[str, str]]]]:
+        report_date, _, rest = path.stem.partition('_')
+        try:
+            datetime.date.fromisoformat(report_date)
+        except ValueError:
+            return None
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        if not rows or 'Query' not in rows[0] or 'Response' not in rows[0]:
+            return None
+        entries = [(row['Query'], row['Response']) for row in rows]
+        if 'Category' in rows[0]:
+            return AGENT_SOURCE, rows[0]['Category'], rows[0].get('Date') or report_date, entries
+        return SPECIES_SOURCE, rest.replace('_', ' '), report_date, entries
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_default_store: Optional[ResearchStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> ResearchStore:
+    """Returns the process-wide store at DEFAULT_STORE_PATH, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ResearchStore()
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and import the indexed research store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="store database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    search = subparsers.add_parser("search", help="search answers, newest first")
+    search.add_argument("text", nargs="?", help="phrase to look for in queries and answers")
+    search.add_argument("--category", help="category, or species name for species reports")
+    search.add_argument("--source", choices=[AGENT_SOURCE, SPECIES_SOURCE])
+    search.add_argument("--days", type=int, help="only the last N days")
+    search.add_argument("--since", help="earliest report date, YYYY-MM-DD")
+    search.add_argument("--until", help="latest report date, YYYY-MM-DD")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true", help="treat TEXT as an FTS5 query expression")
+    search.add_argument("--full", action="store_true", help="print whole answers instead of snippets")
+
+    importer = subparsers.add_parser("import", help="import existing report directories")
+    importer.add_argument("directories", nargs="+")
+
+    subparsers.add_parser("categories", help="list categories with entry counts and date ranges")
+    args = parser.parse_args()
+
+    store = ResearchStore(args.store)
+    if args.command == "import":
+        for directory in args.directories:
+            print(f"{directory}: {store.import_directory(directory)} new entries")
+    elif args.command == "categories":
+        for row in store.categories():
+            print(f"{row['source']:<15} {row['category']:<30} {row['entries']:>6}  {row['first_date']} .. {row['last_date']}")
+    else:
+        since = args.since
+        if args.days is not None:
+            since = (datetime.date.today() - datetime.timedelta(days=args.days)).isoformat()
+        for row in store.search(args.text, args.category, args.source, since, args.until, args.limit, args.raw):
+            print(f"{row['report_date']}  [{row['category']}] {row['query']}")
+            print(f"    {row['response'] if args.full else row['snippet']}\n")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
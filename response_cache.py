@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = "~/.cache/gemini/responses.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 1024
+# In-memory hits are written back to SQLite's last_access in batches of this many keys, or this often
+TOUCH_BATCH_SIZE = 256
+TOUCH_FLUSH_SECONDS = 30.0
+
+
+def make_cache_key(model: str, payload: Dict[str, Any]) -> str:
+    """Hashes the model and the full request payload (contents plus generation parameters)."""
+    canonical = json.dumps({'model': model, 'payload': payload}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """On-disk, content-addressed cache of Gemini responses with TTLs and LRU size-bounded eviction.
+
+    Recently used entries are also kept in a small in-memory LRU so repeated hits skip the SQLite read.
+    Their access times are written back in batches (and before every eviction), so the on-disk LRU
+    order still reflects every hit.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 max_entries: Optional[int] = None, default_ttl: Optional[float] = None,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES, enabled: bool = True):
+        self.path = Path(os.path.expanduser(path))
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.memory: "OrderedDict[str, Tuple[Dict[str, Any], Optional[float]]]" = OrderedDict()
+        self.touched: Dict[str, float] = {}
+        self.touched_flushed = time.time()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL,
+            last_access REAL NOT NULL
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at)")
+        self._recount()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached response for `key`, or None on a miss or an expired entry."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self.memory.move_to_end(key)
+                self.touched[key] = now
+                if len(self.touched) >= TOUCH_BATCH_SIZE or now - self.touched_flushed >= TOUCH_FLUSH_SECONDS:
+                    self._flush_touched()
+                self.hits += 1
+                return entry[0]
+
+            row = self.conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            response = json.loads(row[0])
+            self._remember(key, response, row[1])
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: Dict[str, Any], ttl: Optional[float] = None):
+        """Stores `response`, expiring it after `ttl` seconds (or the cache's default TTL)."""
+        if not self.enabled:
+            return
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        encoded = json.dumps(response, separators=(',', ':'))
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.entries -= 1
+                self.bytes -= previous[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now, expires_at, now)
+            )
+            self.entries += 1
+            self.bytes += len(encoded)
+            self.touched.pop(key, None)
+            self._remember(key, response, expires_at)
+            if self._over_limits():
+                self._evict(now)
+
+    def _remember(self, key: str, response: Dict[str, Any], expires_at: Optional[float]):
+        self.memory[key] = (response, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self.touched:
+            self.conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                  [(accessed, key) for key, accessed in self.touched.items()])
+            self.touched.clear()
+        self.touched_flushed = time.time()
+
+    def _recount(self):
+        self.entries, self.bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def _over_limits(self) -> bool:
+        return ((self.max_entries is not None and self.entries > self.max_entries) or
+                (self.max_bytes is not None and self.bytes > self.max_bytes))
+
+    def _evict(self, now: float):
+        """Drops expired entries, then least recently used ones until the cache is within its limits."""
+        self._flush_touched()
+        self.conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        self._recount()
+        over_entries = self.entries - self.max_entries if self.max_entries is not None else 0
+        over_bytes = self.bytes - self.max_bytes if self.max_bytes is not None else 0
+
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if over_entries <= 0 and over_bytes <= 0:
+                break
+            evicted.append(key)
+            over_entries -= 1
+            over_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            self.memory.pop(key, None)
+        self.evictions += len(evicted)
+        self._recount()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.memory.clear()
+            self.touched.clear()
+            self._recount()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': self.entries,
+            'bytes': self.bytes
+        }
+
+    def close(self):
+        with self.lock:
+            self._flush_touched()
+            self.conn.close()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """Returns the process-wide cache; set GEMINI_CACHE_BYPASS=1 to disable it."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(enabled=os.getenv("GEMINI_CACHE_BYPASS") != "1")
+        return _default_cache
@@ -0,0 +1,124 @@
+import re
+import queue
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Iterator, List, Optional
+
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+
+DEFAULT_SPEECH_CACHE_BYTES = 32 * 1024 * 1024
+
+_END_OF_UTTERANCE = object()
+
+
+def split_sentences(chunks: Iterable[str]) -> Iterator[str]:
+    """Re-chunks streamed text at sentence boundaries, yielding each sentence as soon as it is complete."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def tee_chunks(chunks: Iterable[str], received: List[str],
+               on_chunk: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """Passes streamed chunks through while recording them in `received` and reporting each to `on_chunk`."""
+    for chunk in chunks:
+        received.append(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+        yield chunk
+
+
+class SpeechCache:
+    """Bounded in-memory LRU of synthesized audio, keyed by the text and voice parameters."""
+
+    def __init__(self, max_bytes: int = DEFAULT_SPEECH_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+            return audio
+
+    def put(self, key: Hashable, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self.entries[key] = audio
+            self.bytes += len(audio)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+
+class SpeechPipeline:
+    """Overlaps synthesis and playback: while one sentence plays, the next ones are being synthesized.
+
+    `synthesize` turns a sentence into audio and `play` blocks until that audio has been played.
+    Each runs on its own long-lived thread, connected by bounded queues.
+    """
+
+    def __init__(self, synthesize: Callable[[str], Optional[bytes]], play: Callable[[bytes], None],
+                 max_pending: int = 4):
+        self.synthesize = synthesize
+        self.play = play
+        self.text_queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self.audio_queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self.finished = threading.Event()
+        threading.Thread(target=self._synthesis_worker, daemon=True).start()
+        threading.Thread(target=self._playback_worker, daemon=True).start()
+
+    def _synthesis_worker(self):
+        while True:
+            sentence = self.text_queue.get()
+            if sentence is _END_OF_UTTERANCE:
+                self.audio_queue.put(_END_OF_UTTERANCE)
+                continue
+            try:
+                audio = self.synthesize(sentence)
+            except Exception as e:
+                print(f"Speech synthesis error: {e}")
+                continue
+            if audio:
+                self.audio_queue.put(audio)
+
+    def _playback_worker(self):
+        while True:
+            audio = self.audio_queue.get()
+            if audio is _END_OF_UTTERANCE:
+                self.finished.set()
+                continue
+            try:
+                self.play(audio)
+            except Exception as e:
+                print(f"Playback error: {e}")
+
+    def speak(self, sentences: Iterable[str]):
+        """Queues sentences as they arrive and returns once all of them have been played."""
+        self.finished.clear()
+        for sentence in sentences:
+            self.text_queue.put(sentence)
+        self.text_queue.put(_END_OF_UTTERANCE)
+        self.finished.wait()
+
+    def speak_stream(self, chunks: Iterable[str], on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Speaks streamed text sentence by sentence and returns the full text once playback ends."""
+        received: List[str] = []
+        self.speak(split_sentences(tee_chunks(chunks, received, on_chunk)))
+        return "".join(received)